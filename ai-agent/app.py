@@ -6,24 +6,36 @@ Includes Agentverse Chat Protocol for direct chat in Agentverse dashboard.
 
 from uagents import Agent, Context, Model, Protocol
 from datetime import datetime, timedelta
-from uuid import uuid4
+from uuid import UUID
 from typing import Optional
+from types import SimpleNamespace
+from bisect import bisect_right
+from collections import OrderedDict
 import os
-import json
 import re
+import sys
+import time
 import traceback
 import asyncio
+import functools
+import importlib.util
 
-# Import MeTTa components
-try:
+# MeTTa components are imported lazily - hyperon is a large native extension
+# that only the analysis path needs, so don't pay for it at startup
+METTA_AVAILABLE = importlib.util.find_spec("hyperon") is not None
+if METTA_AVAILABLE:
+    print("✅ MeTTa integration enabled")
+else:
+    print("⚠️ MeTTa not available - using fallback logic")
+
+
+@functools.lru_cache(maxsize=1)
+def _load_metta() -> SimpleNamespace:
+    """Import MeTTa components on first use"""
     from hyperon import MeTTa
     from metta.knowledge import initialize_insurance_knowledge
     from metta.insurance_rag import InsuranceRAG
-    METTA_AVAILABLE = True
-    print("✅ MeTTa integration enabled")
-except ImportError:
-    METTA_AVAILABLE = False
-    print("⚠️ MeTTa not available - using fallback logic")
+    return SimpleNamespace(MeTTa=MeTTa, init=initialize_insurance_knowledge, RAG=InsuranceRAG)
 
 # Import chat protocol from uagents_core - REQUIRED for Agentverse chat button
 try:
@@ -39,6 +51,14 @@ except ImportError:
     CHAT_PROTOCOL_AVAILABLE = False
     print("Warning: uagents_core not found. Chat protocol disabled.")
 
+# Use uvloop for the agent's event loop if installed. This has to happen before
+# Agent(...) is constructed, since the agent grabs its loop from the policy.
+try:
+    import uvloop
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+except ImportError:
+    pass
+
 
 # ========================================
 # MESSAGE MODELS FOR FLIGHT HISTORICAL AGENT
@@ -107,7 +127,7 @@ class InsuranceRecommendation(Model):
     estimated_premium: float
     route_info: Optional[str] = None
     risk_level: Optional[str] = None  # LOW/MEDIUM/HIGH
-    insurance_options: list[InsuranceOption] = []  # All available options
+    insurance_options: tuple[InsuranceOption, ...] = ()  # All available options
 
 
 # ========================================
@@ -141,6 +161,127 @@ class WeatherResponse(Model):
     error: Optional[str] = None
 
 
+def _intern(value: Optional[str]) -> Optional[str]:
+    """Intern an enum-like wire string (risk level, weather condition, airport/airline code) so comparisons and dict lookups hit the identity fast path"""
+    return sys.intern(value) if value is not None else None
+
+
+class _TTLCache:
+    """Small LRU cache whose entries expire ttl seconds after they were stored"""
+    
+    def __init__(self, maxsize: int = 256, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+    
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if time.monotonic() - stored_at >= self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+    
+    def set(self, key, value):
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+    
+    def discard(self, key):
+        self._entries.pop(key, None)
+
+
+# Successful Flight Historical Agent responses keyed by (airline, flight_number, date).
+# Schedules and historical statistics don't change minute-to-minute, so repeat
+# questions about the same flight skip the upstream round trip.
+_flight_cache = _TTLCache(maxsize=256, ttl=300.0)
+
+# Analyses keyed by every flight and weather field the analysis reads, so the same
+# flight asked about again under the same conditions skips the MeTTa reasoning,
+# while a fresh historical response with different figures is analyzed anew.
+# The analysis dicts are shared between hits and must not be mutated.
+_analysis_cache = _TTLCache(maxsize=1024, ttl=300.0)
+
+
+def _analysis_key(flight_data: FlightHistoricalResponse, weather_data: Optional[dict]) -> tuple:
+    """Cache key for analyze_comprehensive_risk(flight_data, weather_data)"""
+    if weather_data:
+        weather_key = (weather_data.get("success"), weather_data.get("condition"), weather_data.get("delay_risk"))
+    else:
+        weather_key = None
+    return (
+        flight_data.airline, flight_data.flight_number, flight_data.date,
+        flight_data.ontime_percent, flight_data.delay_risk, flight_data.risk_score,
+        flight_data.suggested_premium, flight_data.total_historical_flights,
+        flight_data.delayed_count, flight_data.cancelled_count,
+        flight_data.origin_iata, flight_data.destination_iata,
+        flight_data.origin_city, flight_data.destination_city,
+        weather_key,
+    )
+
+# In-flight request state keyed by flight id ("AA100-2025-10-20"): the chat
+# session awaiting a reply, and the sender of a pending protocol request. Kept in
+# memory rather than agent storage, and bounded, so abandoned requests age out
+# instead of accumulating as storage entries.
+_chat_sessions = _TTLCache(maxsize=4096, ttl=600.0)
+_pending_requests = _TTLCache(maxsize=4096, ttl=600.0)
+
+# Chat and protocol requests received, and the count at the last status log
+_requests_received = 0
+_requests_at_last_status = -1
+
+# Weather requests still waiting for a WeatherResponse, keyed by airport code.
+# handle_weather_data resolves the future, so an analysis resumes as soon as the
+# weather arrives instead of always sleeping for the worst case.
+_pending_weather: dict[str, asyncio.Future] = {}
+
+# Successful weather per airport code. Conditions are good for a few minutes, so
+# hub airports shared by many flights don't cost a Weather Agent round trip each.
+_weather_cache = _TTLCache(maxsize=256, ttl=300.0)
+
+# Longest we wait for the Weather Agent before analyzing without fresh weather
+WEATHER_TIMEOUT = 2.0
+
+
+def _expect_weather(airport_code: str) -> asyncio.Future:
+    """Return the future resolved by the next WeatherResponse for airport_code"""
+    future = _pending_weather.get(airport_code)
+    if future is None or future.done():
+        future = asyncio.get_running_loop().create_future()
+        _pending_weather[airport_code] = future
+    return future
+
+
+async def _send_all(ctx: Context, messages: list[tuple[str, Model]]) -> None:
+    """
+    Send several messages concurrently, logging failed sends instead of raising
+    
+    Args:
+        ctx: Agent context
+        messages: (destination address, message) pairs
+    """
+    results = await asyncio.gather(
+        *(ctx.send(destination, message) for destination, message in messages),
+        return_exceptions=True
+    )
+    for (destination, message), result in zip(messages, results):
+        if isinstance(result, Exception):
+            ctx.logger.warning(f"⚠️ {type(message).__name__} to {destination} failed: {result}")
+
+
+def _weather_result(ctx: Context, airport_code: Optional[str], future: Optional[asyncio.Future]) -> Optional[dict]:
+    """Weather delivered to future, or the last stored weather for airport_code if it hasn't arrived"""
+    if not airport_code:
+        return None
+    if future is not None and future.done() and not future.cancelled():
+        return future.result()
+    return ctx.storage.get(f"weather_{airport_code}")
+
+
 # ========================================
 # AGENT ADDRESSES
 # ========================================
@@ -155,36 +296,6 @@ WEATHER_AGENT = os.getenv("WEATHER_AGENT")
 if not WEATHER_AGENT:
     raise ValueError("WEATHER_AGENT must be set in .env file")
 
-# Initialize the insurance recommendation agent with ASI-1 metadata
-insurance_agent = Agent(
-    name="TravelSure-Insurance-Advisor",
-    seed="insurance_advisor_secure_seed_phrase_change_this",
-    mailbox=True,
-    port=8000,  # Use port 8001 to avoid conflict with Flight Historical Agent
-)
-
-# # Add metadata for ASI-1 discoverability
-# insurance_agent.metadata = {
-#     "name": "TravelSure Insurance Advisor",
-#     "description": "AI-powered flight insurance recommendation agent using MeTTa knowledge graphs, historical flight data, and weather analysis to suggest optimal delay insurance thresholds",
-#     "tags": ["insurance", "flight", "travel", "risk-analysis", "metta", "ai", "weather", "delay-protection"],
-#     "version": "1.0.0",
-#     "author": "TravelSure Team",
-#     "capabilities": [
-#         "Flight insurance recommendations",
-#         "Historical flight data analysis",
-#         "Weather-aware risk assessment",
-#         "Multi-factor AI reasoning",
-#         "Time-threshold insurance options",
-#         "Smart contract integration"
-#     ],
-#     "protocols": ["chat", "insurance_recommendation"],
-#     "endpoints": {
-#         "chat": "Supports Agentverse chat protocol for natural language insurance queries",
-#         "insurance_api": "Direct protocol-based insurance recommendations"
-#     }
-# }
-
 # Create protocols
 insurance_protocol = Protocol("InsuranceRecommendation")
 
@@ -194,95 +305,100 @@ if CHAT_PROTOCOL_AVAILABLE:
 else:
     chat_protocol = None
 
-# Initialize MeTTa knowledge graph
+# MeTTa knowledge graph (built once at startup, or on first use)
 metta = None
 insurance_rag = None
 
-if METTA_AVAILABLE:
-    try:
-        metta = MeTTa()
-        initialize_insurance_knowledge(metta)
-        insurance_rag = InsuranceRAG(metta)
-        print("🧠 MeTTa knowledge graph initialized")
-    except Exception as e:
-        print(f"⚠️ MeTTa initialization failed: {e}")
-        METTA_AVAILABLE = False
+
+def get_insurance_rag():
+    """Initialize the MeTTa knowledge graph on first call and return the shared InsuranceRAG"""
+    global metta, insurance_rag, METTA_AVAILABLE
+    
+    if insurance_rag is None and METTA_AVAILABLE:
+        try:
+            components = _load_metta()
+            metta = components.MeTTa()
+            components.init(metta)
+            insurance_rag = components.RAG(metta)
+            print("🧠 MeTTa knowledge graph initialized")
+        except Exception as e:
+            print(f"⚠️ MeTTa initialization failed: {e}")
+            METTA_AVAILABLE = False
+    
+    return insurance_rag
+
+
+def _policy_premium(payout: int, prob_bps: int, margin_bps: int, multiplier_bps: int) -> float:
+    """
+    Premium for a policy tier, mirroring PolicyManager.sol pricing
+    
+    premium = PricingLib.quote(payout, probBps, marginBps) * premiumMultiplierBps / 10000
+    PricingLib.quote = (payout * probBps / 10000) * (10000 + marginBps) / 10000
+    """
+    base = (payout * prob_bps / 10000) * (10000 + margin_bps) / 10000
+    return round((base * multiplier_bps) / 10000, 2)
+
+
+# Policy tiers matching PolicyManager.sol, ordered by threshold:
+# (option_type, name, payout, threshold label, tier, probBps, marginBps, premiumMultiplierBps)
+_TIER_PRICING = (
+    ("delay_1h", "1-Hour Threshold (Platinum)", 1000, "1 hour", "Platinum", 4000, 800, 15000),
+    ("delay_2h", "2-Hour Threshold (Gold)", 500, "2 hours", "Gold", 3500, 700, 15000),
+    ("delay_3h", "3-Hour Threshold (Silver)", 250, "3 hours", "Silver", 3200, 600, 12000),
+    ("delay_4h", "4-Hour Threshold (Basic)", 100, "4 hours", "Basic", 3000, 500, 10000),
+)
+
+# Delay-rate boundaries between the tiers above: <10% -> 1h, <20% -> 2h, <35% -> 3h, else 4h
+_DELAY_RATE_BANDS = (0.10, 0.20, 0.35)
+
+
+# Every option with its premium, built once at import and shared by every request.
+# All pricing inputs are contract constants, so only "recommended" varies per flight;
+# coverage_details is a tuple so the shared prototypes can't be mutated.
+_OPTION_PROTOTYPES = tuple(
+    {
+        "option_type": option_type,
+        "name": name,
+        "description": f"Claim ${payout} payout if delay exceeds {threshold}",
+        "coverage_details": (f"Payout: ${payout} PYUSD", f"Threshold: {threshold}", f"Tier: {tier}"),
+        "premium": _policy_premium(payout, prob_bps, margin_bps, multiplier_bps),
+    }
+    for option_type, name, payout, threshold, tier, prob_bps, margin_bps, multiplier_bps in _TIER_PRICING
+)
+
+
+# Option lookup by type, for the recommended option's premium
+_OPTIONS_BY_TYPE = {prototype["option_type"]: prototype for prototype in _OPTION_PROTOTYPES}
+
+# The complete option list for each delay band (recommended flag already set),
+# so calculate_insurance_options returns a shared tuple instead of building one
+_OPTIONS_BY_BAND = tuple(
+    tuple({**prototype, "recommended": index == band} for index, prototype in enumerate(_OPTION_PROTOTYPES))
+    for band in range(len(_OPTION_PROTOTYPES))
+)
+
+
+def _delay_band(delay_rate: float) -> int:
+    """Index into _TIER_PRICING of the tier recommended for a delay rate"""
+    return bisect_right(_DELAY_RATE_BANDS, delay_rate)
 
 
-def calculate_insurance_options(flight_data: FlightHistoricalResponse, base_premium: float, risk_score: float) -> list[dict]:
+def calculate_insurance_options(flight_data: FlightHistoricalResponse, base_premium: Optional[float] = None, risk_score: Optional[float] = None) -> tuple[dict, ...]:
     """
     Calculate all available insurance options with pricing matching PolicyManager.sol
     
     Args:
         flight_data: FlightHistoricalResponse with complete analysis
-        base_premium: Base premium amount (not used - using smart contract fixed pricing)
-        risk_score: Risk score (0.0 to 1.0)
+        base_premium: Unused - premiums are fixed by the smart contract
+        risk_score: Unused - kept for API compatibility
         
     Returns:
-        List of insurance option dictionaries with smart contract pricing
+        Tuple of insurance option dictionaries with smart contract pricing.
+        The tuple and its dicts are shared between calls and must not be mutated.
     """
-    options = []
-    
     # Calculate delay rate for recommendations
     delay_rate = 1 - (flight_data.ontime_percent if flight_data.ontime_percent else 0.5)
-    
-    # Smart Contract Pricing - matching PolicyManager.sol exactly
-    # Formula: premium = PricingLib.quote(payout, probBps, marginBps) * premiumMultiplierBps / 10000
-    # PricingLib.quote = (payout * probBps / 10000) * (10000 + marginBps) / 10000
-    
-    # 1-HOUR THRESHOLD (Platinum) - Smart contract pricing
-    # Config: payout=$1000, probBps=4000 (40%), marginBps=800 (8%), multiplier=15000 (1.5x)
-    platinum_base = (1000 * 4000 / 10000) * (10000 + 800) / 10000  # = 432
-    platinum_premium = (platinum_base * 15000) / 10000  # = 648.00
-    options.append({
-        "option_type": "delay_1h",
-        "name": "1-Hour Threshold (Platinum)",
-        "description": "Claim $1000 payout if delay exceeds 1 hour",
-        "coverage_details": ["Payout: $1000 PYUSD", "Threshold: 1 hour", "Tier: Platinum"],
-        "premium": round(platinum_premium, 2),
-        "recommended": delay_rate < 0.10  # Very reliable flights only
-    })
-    
-    # 2-HOUR THRESHOLD (Gold) - Smart contract pricing
-    # Config: payout=$500, probBps=3500 (35%), marginBps=700 (7%), multiplier=15000 (1.5x)
-    gold_base = (500 * 3500 / 10000) * (10000 + 700) / 10000  # = 187.25
-    gold_premium = (gold_base * 15000) / 10000  # = 280.88
-    options.append({
-        "option_type": "delay_2h",
-        "name": "2-Hour Threshold (Gold)",
-        "description": "Claim $500 payout if delay exceeds 2 hours",
-        "coverage_details": ["Payout: $500 PYUSD", "Threshold: 2 hours", "Tier: Gold"],
-        "premium": round(gold_premium, 2),
-        "recommended": delay_rate >= 0.10 and delay_rate < 0.20  # Good reliability
-    })
-    
-    # 3-HOUR THRESHOLD (Silver) - Smart contract pricing
-    # Config: payout=$250, probBps=3200 (32%), marginBps=600 (6%), multiplier=12000 (1.2x)
-    silver_base = (250 * 3200 / 10000) * (10000 + 600) / 10000  # = 84.8
-    silver_premium = (silver_base * 12000) / 10000  # = 101.76
-    options.append({
-        "option_type": "delay_3h",
-        "name": "3-Hour Threshold (Silver)",
-        "description": "Claim $250 payout if delay exceeds 3 hours",
-        "coverage_details": ["Payout: $250 PYUSD", "Threshold: 3 hours", "Tier: Silver"],
-        "premium": round(silver_premium, 2),
-        "recommended": delay_rate >= 0.20 and delay_rate < 0.35  # Moderate reliability
-    })
-    
-    # 4-HOUR THRESHOLD (Basic) - Smart contract pricing
-    # Config: payout=$100, probBps=3000 (30%), marginBps=500 (5%), multiplier=10000 (1.0x)
-    basic_base = (100 * 3000 / 10000) * (10000 + 500) / 10000  # = 31.5
-    basic_premium = (basic_base * 10000) / 10000  # = 31.50
-    options.append({
-        "option_type": "delay_4h",
-        "name": "4-Hour Threshold (Basic)",
-        "description": "Claim $100 payout if delay exceeds 4 hours",
-        "coverage_details": ["Payout: $100 PYUSD", "Threshold: 4 hours", "Tier: Basic"],
-        "premium": round(basic_premium, 2),
-        "recommended": delay_rate >= 0.35  # Less reliable flights
-    })
-    
-    return options
+    return _OPTIONS_BY_BAND[_delay_band(delay_rate)]
 
 
 def analyze_comprehensive_risk(flight_data: FlightHistoricalResponse, weather_data: Optional[dict] = None, use_metta: bool = True) -> dict:
@@ -298,11 +414,14 @@ def analyze_comprehensive_risk(flight_data: FlightHistoricalResponse, weather_da
         Dictionary with recommendation, confidence, reasoning, and insurance options
     """
     risk_factors = []
+    # Contextual factor categories already present, so they aren't added twice
+    categories_added = set()
     
     # Use the risk assessment from Historical Agent
     risk_score = flight_data.risk_score if flight_data.risk_score else 0.5
-    delay_risk = flight_data.delay_risk if flight_data.delay_risk else "MEDIUM"
+    delay_risk = _intern(flight_data.delay_risk) if flight_data.delay_risk else "MEDIUM"
     ontime_percent = flight_data.ontime_percent if flight_data.ontime_percent else 0.5
+    ontime_display = f"{ontime_percent*100:.1f}"  # Shared by the reasoning and risk factors
     
     # Calculate base premium
     if flight_data.suggested_premium:
@@ -319,30 +438,33 @@ def analyze_comprehensive_risk(flight_data: FlightHistoricalResponse, weather_da
     # ========================================
     # ENHANCED METTA REASONING (Multi-factor analysis)
     # ========================================
-    if use_metta and METTA_AVAILABLE and insurance_rag:
+    rag = get_insurance_rag() if use_metta and METTA_AVAILABLE else None
+    if rag:
         try:
-            # Prepare comprehensive data for MeTTa analysis
+            # Pass weather condition even if not marked as fully successful
+            weather_condition = weather_data.get("condition") if weather_data else None
+            if not weather_condition and weather_data and weather_data.get("success"):
+                # If marked successful but no condition, use 'clear' as default
+                weather_condition = weather_data.get("condition", "clear")
+            
+            # Prepare comprehensive data for MeTTa analysis; unset fields are left
+            # out so InsuranceRAG applies its own defaults
             metta_input = {
-                'ontime_percent': ontime_percent,
-                'origin_iata': flight_data.origin_iata,
-                'destination_iata': flight_data.destination_iata,
-                'date': flight_data.date,
-                'cancelled_count': flight_data.cancelled_count if flight_data.cancelled_count else 0,
-                'total_historical_flights': flight_data.total_historical_flights
+                key: value
+                for key, value in (
+                    ('ontime_percent', ontime_percent),
+                    ('origin_iata', flight_data.origin_iata),
+                    ('destination_iata', flight_data.destination_iata),
+                    ('date', flight_data.date),
+                    ('cancelled_count', flight_data.cancelled_count),
+                    ('total_historical_flights', flight_data.total_historical_flights),
+                    ('weather_condition', weather_condition),
+                )
+                if value is not None
             }
             
-            # Add weather data if available
-            if weather_data:
-                # Pass weather condition even if not marked as fully successful
-                condition = weather_data.get("condition")
-                if condition:
-                    metta_input['weather_condition'] = condition
-                elif weather_data.get("success"):
-                    # If marked successful but no condition, use 'clear' as default
-                    metta_input['weather_condition'] = weather_data.get("condition", "clear")
-            
             # Get comprehensive MeTTa recommendation with multi-factor reasoning
-            metta_result = insurance_rag.get_comprehensive_recommendation(metta_input)
+            metta_result = rag.get_comprehensive_recommendation(metta_input)
             
             # Use MeTTa's comprehensive analysis
             recommendation = metta_result.get('recommended_type', 'delay_4h')
@@ -350,31 +472,35 @@ def analyze_comprehensive_risk(flight_data: FlightHistoricalResponse, weather_da
             confidence = metta_result.get('confidence', 0.80)
             
             # Use MeTTa's identified risk factors
-            risk_factors.extend(metta_result.get('risk_factors', []))
+            for factor in metta_result.get('risk_factors', []):
+                risk_factors.append(factor)
+                if str(factor).startswith("Cancellation history"):
+                    categories_added.add("cancellation")
+                elif str(factor).startswith("Route:"):
+                    categories_added.add("route")
             
             print(f"[MeTTa] Comprehensive analysis complete: {recommendation} (confidence: {confidence:.2f})")
             print(f"[MeTTa] Risk adjustments applied: {metta_result.get('risk_adjustments_applied', 0):.2f}")
                 
         except Exception as e:
             print(f"MeTTa comprehensive reasoning failed, using fallback: {e}")
-            import traceback
             traceback.print_exc()
-            recommendation, base_reasoning = _fallback_recommendation(delay_rate, ontime_percent, delay_risk)
+            recommendation, base_reasoning = _fallback_recommendation(delay_rate, ontime_percent, delay_risk, ontime_display)
             confidence = 0.75
     else:
         # Fallback logic when MeTTa not available
-        recommendation, base_reasoning = _fallback_recommendation(delay_rate, ontime_percent, delay_risk)
+        recommendation, base_reasoning = _fallback_recommendation(delay_rate, ontime_percent, delay_risk, ontime_display)
         confidence = 0.75
         
         # Manual risk factor building for fallback
         if delay_rate < 0.15:
-            risk_factors.append(f"Excellent on-time record: {ontime_percent*100:.1f}%")
+            risk_factors.append(f"Excellent on-time record: {ontime_display}%")
         elif delay_rate < 0.25:
-            risk_factors.append(f"Good on-time rate: {ontime_percent*100:.1f}%")
+            risk_factors.append(f"Good on-time rate: {ontime_display}%")
             if flight_data.delayed_count:
                 risk_factors.append(f"Past delays: {flight_data.delayed_count} recorded")
         else:
-            risk_factors.append(f"Historical on-time rate: {ontime_percent*100:.1f}%")
+            risk_factors.append(f"Historical on-time rate: {ontime_display}%")
             if flight_data.delayed_count:
                 risk_factors.append(f"Delay history: {flight_data.delayed_count} delays")
         
@@ -389,33 +515,28 @@ def analyze_comprehensive_risk(flight_data: FlightHistoricalResponse, weather_da
             elif weather_risk == "LOW":
                 base_reasoning += f" Clear weather ({weather_condition}) reduces delay concerns."
     
-    # Use the reasoning from MeTTa or fallback
-    full_reasoning = base_reasoning
-    # Use the reasoning from MeTTa or fallback
-    full_reasoning = base_reasoning
-    
     # ========================================
     # ADD ADDITIONAL CONTEXTUAL RISK FACTORS
     # ========================================
     
     # Add cancellation info if relevant
     if flight_data.cancelled_count and flight_data.cancelled_count > 0:
-        if f"Cancellation history" not in str(risk_factors):  # Avoid duplicates from MeTTa
+        if "cancellation" not in categories_added:  # Avoid duplicates from MeTTa
             risk_factors.append(f"Cancellation history: {flight_data.cancelled_count} cancellations recorded")
     
     # Add route information
     if flight_data.origin_city and flight_data.destination_city:
-        if not any("Route:" in str(rf) for rf in risk_factors):  # Avoid duplicates
+        if "route" not in categories_added:  # Avoid duplicates
             risk_factors.append(f"Route: {flight_data.origin_city} → {flight_data.destination_city}")
     
     # Find the recommended option's premium
-    recommended_option = next((opt for opt in insurance_options if opt["option_type"] == recommendation), None)
+    recommended_option = _OPTIONS_BY_TYPE.get(recommendation)
     estimated_premium = recommended_option["premium"] if recommended_option else base_premium
     
     return {
         "recommendation": recommendation,
         "confidence": confidence,
-        "reasoning": full_reasoning,
+        "reasoning": base_reasoning,  # From MeTTa or the fallback
         "risk_factors": risk_factors,
         "estimated_premium": estimated_premium,
         "risk_level": delay_risk,
@@ -424,111 +545,152 @@ def analyze_comprehensive_risk(flight_data: FlightHistoricalResponse, weather_da
     }
 
 
-def _fallback_recommendation(delay_rate: float, ontime_percent: float, delay_risk: str) -> tuple[str, str]:
-    """Fallback recommendation logic when MeTTa is not available"""
+def analyze_comprehensive_risk_batch(flight_datas: list[FlightHistoricalResponse], weather_datas: Optional[list[Optional[dict]]] = None, use_metta: bool = True) -> list[dict]:
+    """
+    Analyze several flights at once, e.g. for a multi-leg itinerary
     
-    if delay_rate < 0.15:
-        # Excellent reliability - recommend 2-hour threshold
-        # Flight rarely delays, so if it does delay, it's unexpected
-        recommendation = "delay_2h"
-        confidence = 0.90
-        reasoning = f"This flight has excellent {delay_risk} risk with {ontime_percent*100:.1f}% on-time performance. 2-hour threshold recommended - flight is highly reliable, so coverage for any delay provides peace of mind."
-        
-        risk_factors.append(f"Excellent on-time record: {ontime_percent*100:.1f}%")
-        risk_factors.append(f"Low historical delays - any delay would be unusual")
-        
-    elif delay_rate < 0.25:
-        # Good reliability - recommend 4-hour threshold
-        recommendation = "delay_4h"
-        confidence = 0.85
-        reasoning = f"This flight has good {delay_risk} risk with {ontime_percent*100:.1f}% on-time performance. 4-hour threshold recommended for balanced protection."
-        
-        risk_factors.append(f"Good on-time rate: {ontime_percent*100:.1f}%")
-        
-        if flight_data.delayed_count:
-            risk_factors.append(f"Past delays: {flight_data.delayed_count} recorded")
-    
-    elif delay_rate < 0.35:
-        # Moderate delays - recommend 6-hour threshold
-        recommendation = "delay_6h"
-        confidence = 0.80
-        reasoning = f"This flight has {delay_risk} risk with {ontime_percent*100:.1f}% on-time performance. 6-hour threshold recommended - moderate delay history suggests coverage for significant delays."
-        
-        risk_factors.append(f"Historical on-time rate: {ontime_percent*100:.1f}%")
-        
-        if flight_data.delayed_count and flight_data.total_historical_flights:
-            delay_rate_percent = (flight_data.delayed_count / flight_data.total_historical_flights) * 100
-            risk_factors.append(f"Delay rate: {delay_rate_percent:.1f}% based on {flight_data.total_historical_flights} flights")
-    
-    elif delay_rate < 0.5:
-        # Frequent delays - recommend 8-hour threshold
-        recommendation = "delay_8h"
-        confidence = 0.85
-        reasoning = f"This flight has {delay_risk} risk with {ontime_percent*100:.1f}% on-time performance. 8-hour threshold recommended - frequent delay history means coverage for extended delays is valuable."
-        
-        if flight_data.delayed_count and flight_data.total_historical_flights:
-            delay_rate_percent = (flight_data.delayed_count / flight_data.total_historical_flights) * 100
-            risk_factors.append(f"High delay rate: {delay_rate_percent:.1f}% based on {flight_data.total_historical_flights} flights")
-        
-        risk_factors.append(f"Flight often experiences delays")
-            
-    else:
-        # Very frequent delays - recommend 12-hour threshold
-        recommendation = "delay_12h"
-        confidence = 0.90
-        reasoning = f"This flight has {delay_risk} risk with {ontime_percent*100:.1f}% on-time performance. 12-hour threshold recommended - flight frequently delayed, focus on extreme delay protection."
-        
-        if flight_data.delayed_count and flight_data.total_historical_flights:
-            delay_rate_percent = (flight_data.delayed_count / flight_data.total_historical_flights) * 100
-            risk_factors.append(f"Very high delay rate: {delay_rate_percent:.1f}% based on {flight_data.total_historical_flights} flights")
-        
-        risk_factors.append(f"Flight has significant delay history")
+    Args:
+        flight_datas: FlightHistoricalResponse per flight
+        weather_datas: Optional weather data per flight, aligned with flight_datas
+        use_metta: Whether to use MeTTa for enhanced reasoning
         
-    # Add cancellation info if relevant
-    if flight_data.cancelled_count and flight_data.cancelled_count > 0:
-        risk_factors.append(f"Cancellation history: {flight_data.cancelled_count} cancellations recorded")
+    Returns:
+        One analysis dictionary per flight, in input order
+    """
+    if weather_datas is None:
+        weather_datas = [None] * len(flight_datas)
+    elif len(weather_datas) != len(flight_datas):
+        raise ValueError("weather_datas must have one entry per flight")
     
-    # Add route information
-    if flight_data.origin_city and flight_data.destination_city:
-        risk_factors.append(f"Route: {flight_data.origin_city} → {flight_data.destination_city}")
+    # Resolve the knowledge graph once for the whole batch
+    use_metta = use_metta and METTA_AVAILABLE and get_insurance_rag() is not None
     
-    # Find the recommended option's premium
-    recommended_option = next((opt for opt in insurance_options if opt["option_type"] == recommendation), None)
-    estimated_premium = recommended_option["premium"] if recommended_option else base_premium
+    return [
+        analyze_comprehensive_risk(flight_data, weather_data=weather_data, use_metta=use_metta)
+        for flight_data, weather_data in zip(flight_datas, weather_datas)
+    ]
+
+
+def _fallback_recommendation(delay_rate: float, ontime_percent: float, delay_risk: str, ontime_display: Optional[str] = None) -> tuple[str, str]:
+    """
+    Fallback recommendation logic when MeTTa is not available
     
-    return {
-        "recommendation": recommendation,
-        "confidence": confidence,
-        "reasoning": reasoning,
-        "risk_factors": risk_factors,
-        "estimated_premium": estimated_premium,
-        "risk_level": delay_risk,
-        "route": f"{flight_data.origin_iata or 'UNK'} → {flight_data.destination_iata or 'UNK'}",
-        "insurance_options": insurance_options
-    }
+    ontime_display is ontime_percent already formatted as a percentage ("82.0"),
+    if the caller has it.
+    """
+    if ontime_display is None:
+        ontime_display = f"{ontime_percent*100:.1f}"
+    return _fallback_for_band(_delay_band(delay_rate), delay_risk, ontime_display)
+
+
+# Fallback (recommendation, reasoning template) per delay band (see _DELAY_RATE_BANDS)
+_FALLBACK_BY_BAND = (
+    # Excellent reliability - recommend 1-hour threshold (Platinum)
+    ("delay_1h", "Excellent {delay_risk} risk with {ontime}% on-time performance. 1-hour Platinum threshold recommended for highly reliable flights."),
+    # Very good reliability - recommend 2-hour threshold (Gold)
+    ("delay_2h", "Very good {delay_risk} risk with {ontime}% on-time performance. 2-hour Gold threshold recommended."),
+    # Moderate reliability - recommend 3-hour threshold (Silver)
+    ("delay_3h", "{delay_risk} risk with {ontime}% on-time performance. 3-hour Silver threshold recommended for balanced protection."),
+    # Lower reliability - recommend 4-hour threshold (Basic)
+    ("delay_4h", "{delay_risk} risk with {ontime}% on-time performance. 4-hour Basic threshold recommended - cost-effective coverage."),
+)
 
 
-def _fallback_recommendation(delay_rate: float, ontime_percent: float, delay_risk: str) -> tuple[str, str]:
-    """Fallback recommendation logic when MeTTa is not available"""
-    
-    if delay_rate < 0.10:
-        # Excellent reliability - recommend 1-hour threshold (Platinum)
-        recommendation = "delay_1h"
-        reasoning = f"Excellent {delay_risk} risk with {ontime_percent*100:.1f}% on-time performance. 1-hour Platinum threshold recommended for highly reliable flights."
-    elif delay_rate < 0.20:
-        # Very good reliability - recommend 2-hour threshold (Gold)
-        recommendation = "delay_2h"
-        reasoning = f"Very good {delay_risk} risk with {ontime_percent*100:.1f}% on-time performance. 2-hour Gold threshold recommended."
-    elif delay_rate < 0.35:
-        # Moderate reliability - recommend 3-hour threshold (Silver)
-        recommendation = "delay_3h"
-        reasoning = f"{delay_risk} risk with {ontime_percent*100:.1f}% on-time performance. 3-hour Silver threshold recommended for balanced protection."
-    else:
-        # Lower reliability - recommend 4-hour threshold (Basic)
-        recommendation = "delay_4h"
-        reasoning = f"{delay_risk} risk with {ontime_percent*100:.1f}% on-time performance. 4-hour Basic threshold recommended - cost-effective coverage."
+@functools.lru_cache(maxsize=128)
+def _fallback_for_band(band: int, delay_risk: str, ontime_display: str) -> tuple[str, str]:
+    """
+    Recommendation and reasoning for a delay band
+    
+    There are only four bands and a handful of risk levels and on-time
+    percentages, so the formatted results are memoized.
+    """
+    recommendation, reasoning = _FALLBACK_BY_BAND[band]
+    return recommendation, reasoning.format(delay_risk=delay_risk, ontime=ontime_display)
+
+
+def build_insurance_recommendation(flight_data: FlightHistoricalResponse, analysis: dict) -> InsuranceRecommendation:
+    """
+    Convert an analysis dictionary into the InsuranceRecommendation wire model
     
-    return recommendation, reasoning
+    The analysis pipeline works on plain dicts; Model instances are only built
+    here, at the protocol boundary, since the chat path never sends them.
+    
+    Every field comes from our own analysis with the declared types already,
+    so the models are built with construct() and skip pydantic validation.
+    
+    Args:
+        flight_data: FlightHistoricalResponse the analysis was computed from
+        analysis: Result of analyze_comprehensive_risk
+        
+    Returns:
+        InsuranceRecommendation ready to send to the requesting agent
+    """
+    insurance_options_objects = tuple(
+        InsuranceOption.construct(
+            option_type=opt['option_type'],
+            name=opt['name'],
+            description=opt['description'],
+            coverage_details=opt['coverage_details'],
+            premium=opt['premium'],
+            recommended=opt.get('recommended', False)
+        )
+        for opt in analysis.get('insurance_options', [])
+    )
+    
+    return InsuranceRecommendation.construct(
+        flight_number=f"{flight_data.airline}{flight_data.flight_number}",
+        recommended_insurance=analysis['recommendation'],
+        confidence_score=analysis['confidence'],
+        reasoning=analysis['reasoning'],
+        risk_factors=analysis['risk_factors'],
+        estimated_premium=analysis['estimated_premium'],
+        route_info=analysis.get('route'),
+        risk_level=analysis.get('risk_level'),
+        insurance_options=insurance_options_objects
+    )
+
+
+_ONE_DAY = timedelta(days=1)
+
+# Flight input parsing patterns - compiled once at import
+_FLIGHT_PATTERN = re.compile(r'\b([A-Z]{2})\s?(\d{1,4})\b')
+
+# Case-insensitive pre-check for _FLIGHT_PATTERN: messages without anything
+# flight-number shaped are rejected without uppercasing them first
+_FLIGHT_HINT = re.compile(r'\b[A-Z]{2}\s?\d{1,4}\b', re.IGNORECASE)
+
+# Numeric dates in one scan; the group that matched tells the format apart
+_DATE_PATTERN = re.compile(
+    r'(?P<iso>\d{4}-\d{2}-\d{2})'  # YYYY-MM-DD
+    r'|(?P<us>(?P<us_month>\d{2})/(?P<us_day>\d{2})/(?P<us_year>\d{4}))'  # MM/DD/YYYY
+    r'|(?P<short>(?P<short_month>\d{1,2})/(?P<short_day>\d{1,2}))'  # MM/DD (current year assumed)
+)
+
+# Map month names to numbers
+_MONTHS = {
+    'JANUARY': '01', 'JAN': '01',
+    'FEBRUARY': '02', 'FEB': '02',
+    'MARCH': '03', 'MAR': '03',
+    'APRIL': '04', 'APR': '04',
+    'MAY': '05',
+    'JUNE': '06', 'JUN': '06',
+    'JULY': '07', 'JUL': '07',
+    'AUGUST': '08', 'AUG': '08',
+    'SEPTEMBER': '09', 'SEP': '09', 'SEPT': '09',
+    'OCTOBER': '10', 'OCT': '10',
+    'NOVEMBER': '11', 'NOV': '11',
+    'DECEMBER': '12', 'DEC': '12'
+}
+
+# (month_num, "Month Day" pattern, "Day Month" pattern) per month name
+_MONTH_DATE_PATTERNS = tuple(
+    (
+        month_num,
+        re.compile(rf'{month_name}\s+(\d{{1,2}})(?:ST|ND|RD|TH)?'),
+        re.compile(rf'(\d{{1,2}})(?:ST|ND|RD|TH)?\s+{month_name}'),
+    )
+    for month_name, month_num in _MONTHS.items()
+)
 
 
 def parse_flight_input(text: str) -> Optional[tuple[str, str, str]]:
@@ -538,11 +700,13 @@ def parse_flight_input(text: str) -> Optional[tuple[str, str, str]]:
     Returns:
         Tuple of (airline, flight_number, date) or None
     """
+    if not _FLIGHT_HINT.search(text):
+        return None
+    
     text_upper = text.upper()
     
     # Try to extract flight number (airline code + number)
-    flight_pattern = r'\b([A-Z]{2})\s?(\d{1,4})\b'
-    match = re.search(flight_pattern, text_upper)
+    match = _FLIGHT_PATTERN.search(text_upper)
     
     if not match:
         return None
@@ -552,305 +716,286 @@ def parse_flight_input(text: str) -> Optional[tuple[str, str, str]]:
     
     # Try to extract date
     date = None
+    now = datetime.now()
     
     # Check for "today" or "tomorrow"
     if 'TODAY' in text_upper:
-        date = datetime.now().strftime('%Y-%m-%d')
+        date = now.strftime('%Y-%m-%d')
     elif 'TOMORROW' in text_upper:
-        date = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
+        date = (now + _ONE_DAY).strftime('%Y-%m-%d')
     else:
-        # Try various date patterns
-        date_patterns = [
-            r'(\d{4}-\d{2}-\d{2})',  # YYYY-MM-DD
-            r'(\d{2}/\d{2}/\d{4})',  # MM/DD/YYYY
-            r'(\d{1,2})/(\d{1,2})',  # MM/DD (current year assumed)
-        ]
-        
-        for pattern in date_patterns:
-            date_match = re.search(pattern, text)
-            if date_match:
-                date_str = date_match.group(0)
-                if '/' in date_str:
-                    parts = date_str.split('/')
-                    if len(parts) == 3:
-                        # MM/DD/YYYY
-                        date = f"{parts[2]}-{parts[0].zfill(2)}-{parts[1].zfill(2)}"
-                    elif len(parts) == 2:
-                        # MM/DD (assume current year)
-                        current_year = datetime.now().year
-                        date = f"{current_year}-{parts[0].zfill(2)}-{parts[1].zfill(2)}"
-                else:
-                    date = date_str
-                break
+        # Try the numeric date formats
+        date_match = _DATE_PATTERN.search(text)
+        if date_match:
+            kind = date_match.lastgroup
+            if kind == 'iso':
+                date = date_match.group('iso')
+            elif kind == 'us':
+                date = f"{date_match.group('us_year')}-{date_match.group('us_month')}-{date_match.group('us_day')}"
+            else:
+                # MM/DD (assume current year)
+                date = f"{now.year}-{date_match.group('short_month').zfill(2)}-{date_match.group('short_day').zfill(2)}"
         
         # If no date found yet, try parsing month names
         if not date:
-            # Map month names to numbers
-            months = {
-                'JANUARY': '01', 'JAN': '01',
-                'FEBRUARY': '02', 'FEB': '02',
-                'MARCH': '03', 'MAR': '03',
-                'APRIL': '04', 'APR': '04',
-                'MAY': '05',
-                'JUNE': '06', 'JUN': '06',
-                'JULY': '07', 'JUL': '07',
-                'AUGUST': '08', 'AUG': '08',
-                'SEPTEMBER': '09', 'SEP': '09', 'SEPT': '09',
-                'OCTOBER': '10', 'OCT': '10',
-                'NOVEMBER': '11', 'NOV': '11',
-                'DECEMBER': '12', 'DEC': '12'
-            }
-            
             # Try to find month name + day (e.g., "October 24th", "Oct 24", "24th October")
-            for month_name, month_num in months.items():
-                # Pattern: "Month Day" or "Day Month"
-                month_day_pattern = rf'{month_name}\s+(\d{{1,2}})(?:ST|ND|RD|TH)?'
-                day_month_pattern = rf'(\d{{1,2}})(?:ST|ND|RD|TH)?\s+{month_name}'
-                
-                match_month_day = re.search(month_day_pattern, text_upper)
-                match_day_month = re.search(day_month_pattern, text_upper)
+            for month_num, month_day_pattern, day_month_pattern in _MONTH_DATE_PATTERNS:
+                match_month_day = month_day_pattern.search(text_upper)
+                match_day_month = day_month_pattern.search(text_upper)
                 
                 if match_month_day:
                     day = match_month_day.group(1).zfill(2)
-                    current_year = datetime.now().year
-                    date = f"{current_year}-{month_num}-{day}"
+                    date = f"{now.year}-{month_num}-{day}"
                     break
                 elif match_day_month:
                     day = match_day_month.group(1).zfill(2)
-                    current_year = datetime.now().year
-                    date = f"{current_year}-{month_num}-{day}"
+                    date = f"{now.year}-{month_num}-{day}"
                     break
     
     # Default to tomorrow if no date specified
     if not date:
-        date = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
+        date = (now + _ONE_DAY).strftime('%Y-%m-%d')
     
     return airline, flight_number, date
 
 
-def format_recommendation_as_text(analysis: dict, airline: str, flight_number: str, date: str, flight_data: FlightHistoricalResponse = None, weather_data: dict = None) -> str:
-    """Format recommendation as readable text with all insurance options"""
-    
-    # Insurance type emoji
-    insurance_emoji = {
-        "delay_1h": "💎",
-        "delay_2h": "🥇",
-        "delay_3h": "🥈",
-        "delay_4h": "🥉",
-        "delay": "⏱️"
-    }
-    
-    emoji = insurance_emoji.get(analysis['recommendation'], "🛡️")
-    
-    response = f"""{emoji} **Insurance Recommendation for Flight {airline}{flight_number}**
+# Emoji lookups for the chat recommendation text
+_INSURANCE_EMOJI = {
+    "delay_1h": "💎",
+    "delay_2h": "🥇",
+    "delay_3h": "🥈",
+    "delay_4h": "🥉",
+    "delay": "⏱️"
+}
+
+_WEATHER_EMOJI = {
+    'clear': '☀️',
+    'clouds': '☁️',
+    'rain': '🌧️',
+    'snow': '❄️',
+    'thunderstorm': '⛈️',
+    'fog': '🌫️',
+    'mist': '🌫️'
+}
+
+_RISK_EMOJI = {
+    'LOW': '✅',
+    'MODERATE': '⚠️',
+    'HIGH': '🔴',
+    'SEVERE': '🚨'
+}
+
+_UNDERSCORE_TO_SPACE = str.maketrans("_", " ")
+_UNDERSCORE_TO_DASH = str.maketrans("_", "-")
+
+
+def _display_forms(recommendation: str) -> tuple[str, str]:
+    """Title-case and upper-case display forms of a recommendation type: ("Delay 1H", "DELAY-1H")"""
+    return (
+        recommendation.translate(_UNDERSCORE_TO_SPACE).title(),
+        recommendation.translate(_UNDERSCORE_TO_DASH).upper(),
+    )
 
-"""
-    
-    # Add flight details if available
-    if flight_data and flight_data.success:
-        response += f"""**Flight Details:**
-✈️ {airline}{flight_number} | {analysis.get('route', 'N/A')}
-📍 {flight_data.origin_city or 'Unknown'} → {flight_data.destination_city or 'Unknown'}
+
+# Display forms of each contract tier, built once
+_RECOMMENDATION_DISPLAY = {option_type: _display_forms(option_type) for option_type in _OPTIONS_BY_TYPE}
+
+
+def _recommendation_display(recommendation: str) -> tuple[str, str]:
+    """Display forms of a recommendation type, formatted on demand for types outside the table"""
+    # MeTTa can recommend types outside the four contract tiers
+    return _RECOMMENDATION_DISPLAY.get(recommendation) or _display_forms(recommendation)
+
+
+# Static blocks of the chat recommendation text
+_SEPARATOR = "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
+
+_OPTIONS_HEADER = f"\n\n{_SEPARATOR}\n**📋 AVAILABLE INSURANCE OPTIONS**\n{_SEPARATOR}\n\n"
+
+_FOOTER = (
+    f"{_SEPARATOR}\n\n"
+    "🌐 **[Visit travelsure.vercel.app to purchase insurance](https://travelsure.vercel.app)**\n\n"
+    "⚡ Smart contract powered • Instant payouts • No paperwork\n\n"
+    "💎 **Bonus: Stake & Earn!**\n\n"
+    "Stake your funds on TravelSure to:\n\n"
+    "• Earn competitive yields on your staked amount\n\n"
+    "• Get FREE cancellation insurance automatically\n\n"
+    "• Support the insurance pool and earn rewards\n\n"
+    "💡 *All recommendations based on real-time data and historical flight performance*"
+)
+
+
+@functools.lru_cache(maxsize=256)
+def _fmt_temp(temp: float) -> str:
+    """Temperature line for the weather section; readings repeat a lot, so results are cached"""
+    # temp * 9 / 5 keeps the multiply exact; folding it into 1.8 shifts the rounding of some readings
+    return f"🌡️ Temperature: {temp:.1f}°C ({temp * 9 / 5 + 32:.1f}°F)\n"
+
+
+_FLIGHT_DETAILS_TEMPLATE = """**Flight Details:**
+✈️ {airline}{flight_number} | {route}
+📍 {origin} → {destination}
 📅 {date}
-🕐 Departure: {flight_data.departure_time[:16] if flight_data.departure_time else 'N/A'}
+🕐 Departure: {departure}
 
 **Performance Metrics:**
-📊 On-time Rate: {flight_data.ontime_percent*100:.1f}% ({flight_data.ontime_count}/{flight_data.total_historical_flights} flights)
-⚠️ Risk Level: {analysis.get('risk_level', 'MEDIUM')}
-📈 Historical Delays: {flight_data.delayed_count}
-❌ Cancellations: {flight_data.cancelled_count}
+📊 On-time Rate: {ontime_rate:.1f}% ({ontime_count}/{total_flights} flights)
+⚠️ Risk Level: {risk_level}
+📈 Historical Delays: {delayed_count}
+❌ Cancellations: {cancelled_count}
 
 """
+
+_WEATHER_PENDING = "🌤️ Weather data: Real-time conditions being checked...\n📡 Weather Agent integration active\n"
+
+
+def _render_weather(parts: list[str], weather_data: Optional[dict]) -> None:
+    """
+    Append the weather section of the chat recommendation
     
-    # Add weather information
-    response += "**Weather Conditions:**\n"
-    if weather_data and weather_data.get('success'):
-        weather_emoji = {
-            'clear': '☀️',
-            'clouds': '☁️',
-            'rain': '🌧️',
-            'snow': '❄️',
-            'thunderstorm': '⛈️',
-            'fog': '🌫️',
-            'mist': '🌫️'
-        }
-        
-        condition = weather_data.get('condition', 'unknown')
-        w_emoji = weather_emoji.get(condition.lower(), '🌤️')
-        temp = weather_data.get('temperature')
+    Args:
+        parts: Response fragments being built by format_recommendation_as_text
+        weather_data: Stored weather data - complete, partial (success=False) or None
+    """
+    append = parts.append
+    append("**Weather Conditions:**\n")
+    
+    if not weather_data:
+        # No weather data object at all
+        append(_WEATHER_PENDING)
+        return
+    
+    condition = weather_data.get('condition')
+    temp = weather_data.get('temperature')
+    w_emoji = _WEATHER_EMOJI.get(condition.lower(), '🌤️') if condition else '🌤️'
+    
+    if weather_data.get('success'):
         delay_risk = weather_data.get('delay_risk', 'UNKNOWN')
-        description = weather_data.get('description', 'N/A')
-        
-        # Risk level emoji
-        risk_emoji = {
-            'LOW': '✅',
-            'MODERATE': '⚠️',
-            'HIGH': '🔴',
-            'SEVERE': '🚨'
-        }
-        r_emoji = risk_emoji.get(delay_risk, '❓')
+        description = weather_data.get('description')
         
-        response += f"""{w_emoji} Current: {description.title() if description else 'N/A'}
-"""
+        append(f"{w_emoji} Current: {description.title() if description else 'N/A'}\n")
         if temp is not None:
-            response += f"""🌡️ Temperature: {temp:.1f}°C ({temp * 9/5 + 32:.1f}°F)
-"""
-        response += f"""{r_emoji} Weather Delay Risk: {delay_risk}
-"""
+            append(_fmt_temp(temp))
+        append(f"{_RISK_EMOJI.get(delay_risk, '❓')} Weather Delay Risk: {delay_risk}\n")
         
         if weather_data.get('risk_reasoning'):
-            response += f"""💡 {weather_data['risk_reasoning']}
-"""
-    else:
-        # Show whatever weather data we have, even if not fully successful
-        if weather_data:
-            condition = weather_data.get('condition')
-            temp = weather_data.get('temperature')
-            delay_risk = weather_data.get('delay_risk')
-            
-            if condition or temp or delay_risk:
-                # We have partial data, show it
-                response += "🌤️ **Weather Status:**\n"
-                
-                if condition:
-                    weather_emoji_fallback = {
-                        'clear': '☀️',
-                        'clouds': '☁️',
-                        'rain': '🌧️',
-                        'snow': '❄️',
-                        'thunderstorm': '⛈️',
-                        'fog': '🌫️',
-                        'mist': '🌫️'
-                    }
-                    w_emoji = weather_emoji_fallback.get(condition.lower(), '🌤️')
-                    response += f"{w_emoji} Condition: {condition.title()}\n"
-                
-                if temp is not None:
-                    response += f"🌡️ Temperature: {temp:.1f}°C ({temp * 9/5 + 32:.1f}°F)\n"
-                
-                if delay_risk:
-                    risk_emoji_fallback = {'LOW': '✅', 'MODERATE': '⚠️', 'HIGH': '🔴', 'SEVERE': '🚨'}
-                    r_emoji = risk_emoji_fallback.get(delay_risk, '❓')
-                    response += f"{r_emoji} Weather Delay Risk: {delay_risk}\n"
-            else:
-                # No usable data at all
-                response += "🌤️ Weather data: Real-time conditions being checked...\n"
-                response += "📡 Weather Agent integration active\n"
-        else:
-            # No weather data object at all
-            response += "🌤️ Weather data: Real-time conditions being checked...\n"
-            response += "📡 Weather Agent integration active\n"
+            append(f"💡 {weather_data['risk_reasoning']}\n")
+        return
     
-    response += "\n"
+    # Show whatever weather data we have, even if not fully successful
+    delay_risk = weather_data.get('delay_risk')
+    if not (condition or temp or delay_risk):
+        # No usable data at all
+        append(_WEATHER_PENDING)
+        return
     
-    response += f"""**Our Recommendation:** {analysis['recommendation'].replace('_', ' ').title()}
-**Confidence:** {analysis['confidence'] * 100:.0f}%
+    append("🌤️ **Weather Status:**\n")
+    if condition:
+        append(f"{w_emoji} Condition: {condition.title()}\n")
+    if temp is not None:
+        append(_fmt_temp(temp))
+    if delay_risk:
+        append(f"{_RISK_EMOJI.get(delay_risk, '❓')} Weather Delay Risk: {delay_risk}\n")
 
-"""
+
+def format_recommendation_as_text(analysis: dict, airline: str, flight_number: str, date: str, flight_data: FlightHistoricalResponse = None, weather_data: dict = None) -> str:
+    """Format recommendation as readable text with all insurance options"""
+    
+    emoji = _INSURANCE_EMOJI.get(analysis['recommendation'], "🛡️")
+    
+    parts = [f"""{emoji} **Insurance Recommendation for Flight {airline}{flight_number}**
+
+"""]
+    append = parts.append
+    
+    # Add flight details if available
+    if flight_data and flight_data.success:
+        append(_FLIGHT_DETAILS_TEMPLATE.format(
+            airline=airline,
+            flight_number=flight_number,
+            route=analysis.get('route', 'N/A'),
+            origin=flight_data.origin_city or 'Unknown',
+            destination=flight_data.destination_city or 'Unknown',
+            date=date,
+            departure=flight_data.departure_time[:16] if flight_data.departure_time else 'N/A',
+            ontime_rate=flight_data.ontime_percent * 100,
+            ontime_count=flight_data.ontime_count,
+            total_flights=flight_data.total_historical_flights,
+            risk_level=analysis.get('risk_level', 'MEDIUM'),
+            delayed_count=flight_data.delayed_count,
+            cancelled_count=flight_data.cancelled_count,
+        ))
+    
+    # Add weather information
+    _render_weather(parts, weather_data)
+    
+    append("\n")
+    
+    conf_pct = analysis['confidence'] * 100
+    display_title, display_upper = _recommendation_display(analysis['recommendation'])
+    append(f"""**Our Recommendation:** {display_title}
+**Confidence:** {conf_pct:.0f}%
+
+""")
     
     # Format the reasoning - split by newlines and display each point
     reasoning_text = analysis['reasoning']
     if '🔍' in reasoning_text:
         # MeTTa provided detailed multi-factor reasoning - show it beautifully
-        response += "**🧠 AI Multi-Factor Analysis:**\n"
+        append("**🧠 AI Multi-Factor Analysis:**\n")
         reasoning_lines = reasoning_text.split('\n')
         for line in reasoning_lines:
             line = line.strip()
             if line:
                 # Each line is already formatted with emoji from MeTTa
-                response += f"{line}\n"
+                append(f"{line}\n")
         
         # Add final recommendation summary
-        response += "\n**💡 Final Recommendation:**\n\n"
-        response += f"Based on comprehensive AI analysis of {analysis.get('risk_factors', []).__len__()} risk factors, we recommend **{analysis['recommendation'].replace('_', '-').upper()}** insurance coverage with **{analysis['confidence'] * 100:.0f}%** confidence.**\n"
+        append("\n**💡 Final Recommendation:**\n\n")
+        rf_count = len(analysis.get('risk_factors') or ())
+        append(f"Based on comprehensive AI analysis of {rf_count} risk factors, we recommend **{display_upper}** insurance coverage with **{conf_pct:.0f}%** confidence.**\n")
     else:
         # Simple reasoning without multi-factor breakdown
-        response += "**📊 Analysis:**\n"
-        response += f"{reasoning_text}\n"
+        append("**📊 Analysis:**\n")
+        append(f"{reasoning_text}\n")
     
-    response += "\n**⚠️ Identified Risk Factors:**\n"
+    append("\n**⚠️ Identified Risk Factors:**\n")
     for factor in analysis['risk_factors']:
-        response += f"• {factor}\n"
+        append(f"• {factor}\n")
     
     # Display all insurance options
-    response += "\n\n━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
-    response += "**📋 AVAILABLE INSURANCE OPTIONS**\n"
-    response += "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+    append(_OPTIONS_HEADER)
     
     insurance_options = analysis.get('insurance_options', [])
     
-    # Update emoji map for new options
-    insurance_emoji_extended = {
-        "delay_1h": "💎",
-        "delay_2h": "🥇",
-        "delay_3h": "🥈",
-        "delay_4h": "🥉",
-        "delay": "⏱️"
-    }
-    
     for idx, option in enumerate(insurance_options, 1):
-        option_emoji = insurance_emoji_extended.get(option['option_type'], "📄")
+        option_emoji = _INSURANCE_EMOJI.get(option['option_type'], "📄")
         is_recommended = option.get('recommended', False) or option['option_type'] == analysis['recommendation']
         
         # Add star for recommended option
         rec_marker = " ⭐ **RECOMMENDED**" if is_recommended else ""
         
-        response += f"""**{idx}. {option_emoji} {option['name']}**{rec_marker}
+        append(f"""**{idx}. {option_emoji} {option['name']}**{rec_marker}
 💵 Premium: **${option['premium']:.2f}**
 
 {option['description']}
-"""
-        response += "\n"
+""")
+        append("\n")
     
-    response += "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-    response += "🌐 **[Visit travelsure.vercel.app to purchase insurance](https://travelsure.vercel.app)**\n\n"
-    response += "⚡ Smart contract powered • Instant payouts • No paperwork\n\n"
-    response += "💎 **Bonus: Stake & Earn!**\n\n"
-    response += "Stake your funds on TravelSure to:\n\n"
-    response += "• Earn competitive yields on your staked amount\n\n"
-    response += "• Get FREE cancellation insurance automatically\n\n"
-    response += "• Support the insurance pool and earn rewards\n\n"
-    response += "💡 *All recommendations based on real-time data and historical flight performance*"
+    append(_FOOTER)
     
-    return response
+    return "".join(parts)
 
 
 # ========================================
-# CHAT PROTOCOL HANDLERS
+# CHAT RESPONSES
 # ========================================
 
-if CHAT_PROTOCOL_AVAILABLE and chat_protocol:
-    @chat_protocol.on_message(ChatMessage)
-    async def handle_chat_message(ctx: Context, sender: str, msg: ChatMessage):
-        """Handle incoming chat messages from Agentverse"""
-        try:
-            # Extract text content
-            text_content = None
-            for content in msg.content:
-                if hasattr(content, 'text'):
-                    text_content = content.text
-                    break
-            
-            if not text_content:
-                ctx.logger.warning("Received chat message without text content")
-                return
-            
-            ctx.logger.info(f"Chat from {sender}: {text_content}")
-            
-            # Send acknowledgement
-            await ctx.send(
-                sender,
-                ChatAcknowledgement(
-                    timestamp=datetime.now(),
-                    acknowledged_msg_id=msg.msg_id
-                )
-            )
-            
-            text_lower = text_content.lower()
-            
-            # Handle greetings
-            if any(word in text_lower for word in ['hello', 'hi', 'hey', 'greetings']):
-                response_text = """👋 Hello! I'm your TravelSure Insurance Advisor.
+# Whole words only, so e.g. "this" or "Thigh" aren't mistaken for "hi"
+_GREETING_PATTERN = re.compile(r'\b(?:hello|hi|hey|greetings)\b', re.IGNORECASE)
+_HELP_PATTERN = re.compile(r'\bhelp\b', re.IGNORECASE)
+
+GREETING_TEXT = """👋 Hello! I'm your TravelSure Insurance Advisor.
 
 I analyze flights using real-time data, historical performance, and AI-powered knowledge graphs to recommend the best insurance coverage!
 
@@ -879,20 +1024,8 @@ Tell me your flight number and date:
 🌐 Purchase at: travelsure.vercel.app
 
 What flight would you like me to analyze?"""
-                
-                await ctx.send(
-                    sender,
-                    ChatMessage(
-                        timestamp=datetime.now(),
-                        msg_id=uuid4(),
-                        content=[TextContent(type="text", text=response_text)]
-                    )
-                )
-                return
-            
-            # Handle help requests
-            if 'help' in text_lower:
-                response_text = """📋 **TravelSure Insurance Advisor - Help**
+
+HELP_TEXT = """📋 **TravelSure Insurance Advisor - Help**
 
 **How It Works:**
 1. **Tell me your flight** - Include airline code + number and optional date
@@ -938,15 +1071,101 @@ What flight would you like me to analyze?"""
 "I need insurance for flight AA100 on 2025-10-25"
 
 Ready to analyze your flight with multi-factor AI reasoning!"""
-                
-                await ctx.send(
-                    sender,
-                    ChatMessage(
-                        timestamp=datetime.now(),
-                        msg_id=uuid4(),
-                        content=[TextContent(type="text", text=response_text)]
-                    )
+
+NO_FLIGHT_TEXT = """❌ I couldn't find a valid flight number in your message.
+
+**Please provide:**
+• Airline code (2 letters): AA, UA, BA, DL, etc.
+• Flight number: 100, 890, 001, etc.
+• Date (optional): 2025-10-20, tomorrow, today
+
+**Examples:**
+• "Check flight AA100 on 2025-10-20"
+• "I have UA890 tomorrow"
+• "Analyze BA001"
+
+Type 'help' for more information."""
+
+CHAT_ERROR_TEXT = "Sorry, I encountered an error. Please try again."
+
+
+# Random bytes for outgoing message ids, drawn from os.urandom 256 ids at a time
+# rather than with one urandom call per uuid4()
+_MSG_ID_BATCH = 256
+_msg_id_pool: list[UUID] = []
+
+
+def _next_msg_id() -> UUID:
+    """Return a fresh random (version 4) UUID from the pre-generated pool"""
+    if not _msg_id_pool:
+        raw = os.urandom(16 * _MSG_ID_BATCH)
+        _msg_id_pool.extend(UUID(bytes=raw[i:i + 16], version=4) for i in range(0, len(raw), 16))
+    return _msg_id_pool.pop()
+
+
+async def _send_content(ctx: Context, destination: str, content: list) -> None:
+    """Send a ChatMessage carrying content to a chat peer"""
+    await ctx.send(
+        destination,
+        ChatMessage(
+            timestamp=datetime.now(),
+            msg_id=_next_msg_id(),
+            content=content
+        )
+    )
+
+
+async def _send_text(ctx: Context, destination: str, text: str) -> None:
+    """Send text to a chat peer as a single-content ChatMessage"""
+    await _send_content(ctx, destination, [TextContent(type="text", text=text)])
+
+
+if CHAT_PROTOCOL_AVAILABLE:
+    # Content for the constant replies, validated once here instead of per send
+    # (ChatMessage copies the list, so the shared instances are never mutated)
+    GREETING_CONTENT = [TextContent(type="text", text=GREETING_TEXT)]
+    HELP_CONTENT = [TextContent(type="text", text=HELP_TEXT)]
+    NO_FLIGHT_CONTENT = [TextContent(type="text", text=NO_FLIGHT_TEXT)]
+    CHAT_ERROR_CONTENT = [TextContent(type="text", text=CHAT_ERROR_TEXT)]
+
+
+# ========================================
+# CHAT PROTOCOL HANDLERS
+# ========================================
+
+if CHAT_PROTOCOL_AVAILABLE and chat_protocol:
+    @chat_protocol.on_message(ChatMessage)
+    async def handle_chat_message(ctx: Context, sender: str, msg: ChatMessage):
+        """Handle incoming chat messages from Agentverse"""
+        global _requests_received
+        _requests_received += 1
+        try:
+            # Extract text content (first text item)
+            text_content = next((content.text for content in msg.content if isinstance(content, TextContent)), None)
+            
+            if not text_content:
+                ctx.logger.warning("Received chat message without text content")
+                return
+            
+            ctx.logger.info(f"Chat from {sender}: {text_content}")
+            
+            # Send acknowledgement
+            await ctx.send(
+                sender,
+                ChatAcknowledgement(
+                    timestamp=datetime.now(),
+                    acknowledged_msg_id=msg.msg_id
                 )
+            )
+            
+            # Handle greetings
+            if _GREETING_PATTERN.search(text_content):
+                await _send_content(ctx, sender, GREETING_CONTENT)
+                return
+            
+            # Handle help requests
+            if _HELP_PATTERN.search(text_content):
+                await _send_content(ctx, sender, HELP_CONTENT)
                 return
             
             # Try to parse flight information
@@ -956,11 +1175,13 @@ Ready to analyze your flight with multi-factor AI reasoning!"""
                 airline, flight_number, date = flight_info
                 full_flight_id = f"{airline}{flight_number}-{date}"
                 
-                # Store sender for later response
-                ctx.storage.set(f"chat_sender_{full_flight_id}", sender)
-                ctx.storage.set(f"chat_airline_{full_flight_id}", airline)
-                ctx.storage.set(f"chat_flight_{full_flight_id}", flight_number)
-                ctx.storage.set(f"chat_date_{full_flight_id}", date)
+                # Store the chat session (sender and parsed flight) for the later response
+                _chat_sessions.set(full_flight_id, {
+                    "sender": sender,
+                    "airline": airline,
+                    "flight_number": flight_number,
+                    "date": date,
+                })
                 
                 # Send processing message
                 processing_text = f"""🔍 Analyzing flight {airline}{flight_number} on {date}...
@@ -975,20 +1196,20 @@ Ready to analyze your flight with multi-factor AI reasoning!"""
 • 📅 Seasonal risk factors
 
 Please wait..."""
-                await ctx.send(
-                    sender,
-                    ChatMessage(
-                        timestamp=datetime.now(),
-                        msg_id=uuid4(),
-                        content=[TextContent(type="text", text=processing_text)]
-                    )
-                )
+                await _send_text(ctx, sender, processing_text)
+                
+                cached = _flight_cache.get((airline, flight_number, date))
+                if cached is not None:
+                    ctx.logger.info(f"Using cached historical data for {airline}{flight_number} on {date}")
+                    await process_flight_data(ctx, cached)
+                    return
                 
-                # Request comprehensive flight analysis
+                # Request comprehensive flight analysis; the fields are strings from
+                # parse_flight_input, so construct() skips pydantic validation
                 ctx.logger.info(f"Requesting historical data for {airline}{flight_number} on {date}")
                 await ctx.send(
                     FLIGHT_HISTORICAL_AGENT,
-                    FlightHistoricalRequest(
+                    FlightHistoricalRequest.construct(
                         airline=airline,
                         flight_number=flight_number,
                         date=date
@@ -996,40 +1217,11 @@ Please wait..."""
                 )
             else:
                 # No flight number found
-                response_text = """❌ I couldn't find a valid flight number in your message.
-
-**Please provide:**
-• Airline code (2 letters): AA, UA, BA, DL, etc.
-• Flight number: 100, 890, 001, etc.
-• Date (optional): 2025-10-20, tomorrow, today
-
-**Examples:**
-• "Check flight AA100 on 2025-10-20"
-• "I have UA890 tomorrow"
-• "Analyze BA001"
-
-Type 'help' for more information."""
-                
-                await ctx.send(
-                    sender,
-                    ChatMessage(
-                        timestamp=datetime.now(),
-                        msg_id=uuid4(),
-                        content=[TextContent(type="text", text=response_text)]
-                    )
-                )
+                await _send_content(ctx, sender, NO_FLIGHT_CONTENT)
                 
         except Exception as e:
             ctx.logger.error(f"Error in chat handler: {e}")
-            error_text = "Sorry, I encountered an error. Please try again."
-            await ctx.send(
-                sender,
-                ChatMessage(
-                    timestamp=datetime.now(),
-                    msg_id=uuid4(),
-                    content=[TextContent(type="text", text=error_text)]
-                )
-            )
+            await _send_content(ctx, sender, CHAT_ERROR_CONTENT)
 
 
     @chat_protocol.on_message(ChatAcknowledgement)
@@ -1045,21 +1237,30 @@ Type 'help' for more information."""
 # WEATHER AGENT RESPONSE HANDLER
 # ========================================
 
-@insurance_agent.on_message(model=WeatherResponse)
 async def handle_weather_data(ctx: Context, sender: str, msg: WeatherResponse):
     """Handle weather data from Weather Agent"""
     ctx.logger.info(f"[WEATHER] Received weather data for: {msg.airport_code}")
     
     try:
+        airport_code = _intern(msg.airport_code)
+        
         # Store weather data temporarily
-        ctx.storage.set(f"weather_{msg.airport_code}", {
+        weather = {
             "success": msg.success,
-            "condition": msg.condition,
+            "condition": _intern(msg.condition),
             "temperature": msg.temperature,
-            "delay_risk": msg.delay_risk,
+            "delay_risk": _intern(msg.delay_risk),
             "risk_reasoning": msg.risk_reasoning,
             "description": msg.description
-        })
+        }
+        ctx.storage.set(f"weather_{airport_code}", weather)
+        if msg.success:
+            _weather_cache.set(airport_code, weather)
+        
+        # Wake up any analysis waiting on this airport
+        future = _pending_weather.pop(airport_code, None)
+        if future is not None and not future.done():
+            future.set_result(weather)
         
         if msg.success:
             ctx.logger.info(f"✅ Weather: {msg.condition}, Risk: {msg.delay_risk}")
@@ -1074,63 +1275,86 @@ async def handle_weather_data(ctx: Context, sender: str, msg: WeatherResponse):
 # FLIGHT HISTORICAL AGENT RESPONSE HANDLER
 # ========================================
 
-@insurance_agent.on_message(model=FlightHistoricalResponse)
 async def handle_flight_historical_data(ctx: Context, sender: str, msg: FlightHistoricalResponse):
     """Handle comprehensive flight data from Flight Historical Agent"""
     ctx.logger.info(f"[HANDLER] Received historical data for: {msg.airline}{msg.flight_number} on {msg.date}")
     
+    if msg.success:
+        # The codes key the flight, weather and pending-request lookups for this flight
+        msg.airline = _intern(msg.airline)
+        msg.origin_iata = _intern(msg.origin_iata)
+        msg.destination_iata = _intern(msg.destination_iata)
+        _flight_cache.set((msg.airline, msg.flight_number, msg.date), msg)
+    
+    await process_flight_data(ctx, msg)
+
+
+async def process_flight_data(ctx: Context, msg: FlightHistoricalResponse):
+    """
+    Fetch route weather, analyze the flight and reply to whoever asked about it
+    
+    Args:
+        ctx: Agent context
+        msg: FlightHistoricalResponse, either fresh from the Historical Agent or cached
+    """
     try:
         full_flight_id = f"{msg.airline}{msg.flight_number}-{msg.date}"
         
+        # Drop unsolicited or already-answered responses before any weather or analysis work
+        if _chat_sessions.get(full_flight_id) is None and _pending_requests.get(full_flight_id) is None:
+            ctx.logger.warning(f"No sender found for flight {full_flight_id}")
+            return
+        
         if not msg.success:
             # Handle error from Historical Agent
             ctx.logger.error(f"Historical Agent error: {msg.error}")
             
-            chat_sender = ctx.storage.get(f"chat_sender_{full_flight_id}")
-            if chat_sender:
+            chat_session = _chat_sessions.get(full_flight_id)
+            if chat_session:
+                chat_sender = chat_session["sender"]
                 error_text = f"❌ Unable to analyze flight {msg.airline}{msg.flight_number}:\n\n{msg.error}\n\nPlease verify the flight number and date, then try again."
-                await ctx.send(
-                    chat_sender,
-                    ChatMessage(
-                        timestamp=datetime.now(),
-                        msg_id=uuid4(),
-                        content=[TextContent(type="text", text=error_text)]
-                    )
-                )
-                ctx.storage.set(f"chat_sender_{full_flight_id}", None)
+                await _send_text(ctx, chat_sender, error_text)
+                _chat_sessions.discard(full_flight_id)
             return
         
         # ========================================
         # REQUEST WEATHER DATA FOR BOTH AIRPORTS
         # ========================================
-        weather_data_origin = None
-        weather_data_dest = None
-        
-        if msg.origin_iata:
+        # Request both airports at once, then wait until both have answered
+        # (or WEATHER_TIMEOUT passes) instead of sleeping a fixed interval.
+        # Airports with recent weather in the cache aren't requested at all.
+        # Requests are built with construct(): the codes come from a validated response.
+        weather_data_origin = _weather_cache.get(msg.origin_iata) if msg.origin_iata else None
+        weather_data_dest = _weather_cache.get(msg.destination_iata) if msg.destination_iata else None
+        weather_requests = []
+        origin_future = dest_future = None
+        if msg.origin_iata and weather_data_origin is None:
             ctx.logger.info(f"Requesting weather for origin: {msg.origin_iata}")
-            await ctx.send(
-                WEATHER_AGENT,
-                WeatherRequest(
-                    airport_code=msg.origin_iata,
-                    city=msg.origin_city
-                )
+            origin_future = _expect_weather(msg.origin_iata)
+            weather_requests.append(
+                (WEATHER_AGENT, WeatherRequest.construct(airport_code=msg.origin_iata, city=msg.origin_city))
             )
-            # Wait a bit for weather response
-            await asyncio.sleep(2)
-            weather_data_origin = ctx.storage.get(f"weather_{msg.origin_iata}")
-        
-        if msg.destination_iata:
+        if msg.destination_iata and weather_data_dest is None:
             ctx.logger.info(f"Requesting weather for destination: {msg.destination_iata}")
-            await ctx.send(
-                WEATHER_AGENT,
-                WeatherRequest(
-                    airport_code=msg.destination_iata,
-                    city=msg.destination_city
-                )
+            dest_future = _expect_weather(msg.destination_iata)
+            weather_requests.append(
+                (WEATHER_AGENT, WeatherRequest.construct(airport_code=msg.destination_iata, city=msg.destination_city))
             )
-            # Wait a bit for weather response
-            await asyncio.sleep(2)
-            weather_data_dest = ctx.storage.get(f"weather_{msg.destination_iata}")
+        
+        if weather_requests:
+            await _send_all(ctx, weather_requests)
+            # One shared deadline for both airports
+            weather_futures = [future for future in (origin_future, dest_future) if future is not None]
+            _, pending = await asyncio.wait(weather_futures, timeout=WEATHER_TIMEOUT)
+            if pending:
+                ctx.logger.warning(f"⚠️ Weather Agent did not answer within {WEATHER_TIMEOUT:.0f}s")
+        
+        # Take fresh answers straight from the futures; fall back to the last
+        # stored weather for an airport that didn't answer in time
+        if weather_data_origin is None:
+            weather_data_origin = _weather_result(ctx, msg.origin_iata, origin_future)
+        if weather_data_dest is None:
+            weather_data_dest = _weather_result(ctx, msg.destination_iata, dest_future)
         
         # Use worst-case weather data for analysis
         weather_data = weather_data_dest if weather_data_dest else weather_data_origin
@@ -1149,96 +1373,60 @@ async def handle_flight_historical_data(ctx: Context, sender: str, msg: FlightHi
         if weather_data:
             ctx.logger.info(f"Weather considered: {weather_data.get('condition')} ({weather_data.get('delay_risk')})")
         
-        analysis = analyze_comprehensive_risk(msg, weather_data=weather_data, use_metta=METTA_AVAILABLE)
+        analysis_key = _analysis_key(msg, weather_data)
+        analysis = _analysis_cache.get(analysis_key)
+        if analysis is None:
+            analysis = analyze_comprehensive_risk(msg, weather_data=weather_data, use_metta=METTA_AVAILABLE)
+            _analysis_cache.set(analysis_key, analysis)
+        else:
+            ctx.logger.info(f"Using cached analysis for {full_flight_id}")
         
         ctx.logger.info(f"Analysis complete: {analysis['recommendation']} (confidence: {analysis['confidence']:.2f})")
         
-        # Create InsuranceOption objects from the analysis
-        insurance_options_objects = []
-        for opt in analysis.get('insurance_options', []):
-            insurance_options_objects.append(
-                InsuranceOption(
-                    option_type=opt['option_type'],
-                    name=opt['name'],
-                    description=opt['description'],
-                    coverage_details=opt['coverage_details'],
-                    premium=opt['premium'],
-                    recommended=opt.get('recommended', False)
-                )
-            )
-        
-        # Create recommendation object
-        recommendation = InsuranceRecommendation(
-            flight_number=f"{msg.airline}{msg.flight_number}",
-            recommended_insurance=analysis['recommendation'],
-            confidence_score=analysis['confidence'],
-            reasoning=analysis['reasoning'],
-            risk_factors=analysis['risk_factors'],
-            estimated_premium=analysis['estimated_premium'],
-            route_info=analysis.get('route'),
-            risk_level=analysis.get('risk_level'),
-            insurance_options=insurance_options_objects
-        )
-        
         # Check if this was from a chat request
-        chat_sender = ctx.storage.get(f"chat_sender_{full_flight_id}")
+        chat_session = _chat_sessions.get(full_flight_id)
         
-        if chat_sender:
+        if chat_session:
             # Send formatted response via chat
-            airline = ctx.storage.get(f"chat_airline_{full_flight_id}")
-            flight_number = ctx.storage.get(f"chat_flight_{full_flight_id}")
-            date = ctx.storage.get(f"chat_date_{full_flight_id}")
+            chat_sender = chat_session["sender"]
+            airline = chat_session["airline"]
+            flight_number = chat_session["flight_number"]
+            date = chat_session["date"]
             
             response_text = format_recommendation_as_text(analysis, airline, flight_number, date, msg, weather_data)
             
             ctx.logger.info(f"Sending recommendation to {chat_sender}")
             
-            await ctx.send(
-                chat_sender,
-                ChatMessage(
-                    timestamp=datetime.now(),
-                    msg_id=uuid4(),
-                    content=[TextContent(type="text", text=response_text)]
-                )
-            )
+            await _send_text(ctx, chat_sender, response_text)
             
             # Clear storage
-            ctx.storage.set(f"chat_sender_{full_flight_id}", None)
-            ctx.storage.set(f"chat_airline_{full_flight_id}", None)
-            ctx.storage.set(f"chat_flight_{full_flight_id}", None)
-            ctx.storage.set(f"chat_date_{full_flight_id}", None)
+            _chat_sessions.discard(full_flight_id)
             
             ctx.logger.info(f"Sent chat response for {msg.airline}{msg.flight_number}")
         else:
             # Handle non-chat request (direct protocol message)
             ctx.logger.info(f"No chat sender found, checking for pending request")
-            original_sender = ctx.storage.get(f"pending_{full_flight_id}")
+            original_sender = _pending_requests.get(full_flight_id)
             if original_sender:
+                recommendation = build_insurance_recommendation(msg, analysis)
                 await ctx.send(original_sender, recommendation)
-                ctx.storage.set(f"pending_{full_flight_id}", None)
+                _pending_requests.discard(full_flight_id)
                 ctx.logger.info(f"Sent insurance recommendation to {original_sender}")
             else:
                 ctx.logger.warning(f"No sender found for flight {full_flight_id}")
             
     except Exception as e:
         ctx.logger.error(f"Error processing historical data: {e}")
-        import traceback
         ctx.logger.error(f"Traceback: {traceback.format_exc()}")
         
         # Try to send error message back to chat sender
         full_flight_id = f"{msg.airline}{msg.flight_number}-{msg.date}"
-        chat_sender = ctx.storage.get(f"chat_sender_{full_flight_id}")
-        if chat_sender:
+        chat_session = _chat_sessions.get(full_flight_id)
+        if chat_session:
+            chat_sender = chat_session["sender"]
             error_text = f"❌ Sorry, I encountered an error analyzing flight {msg.airline}{msg.flight_number}. Please try again."
-            await ctx.send(
-                chat_sender,
-                ChatMessage(
-                    timestamp=datetime.now(),
-                    msg_id=uuid4(),
-                    content=[TextContent(type="text", text=error_text)]
-                )
-            )
-            ctx.storage.set(f"chat_sender_{full_flight_id}", None)
+            await _send_text(ctx, chat_sender, error_text)
+            _chat_sessions.discard(full_flight_id)
 
 
 # ========================================
@@ -1248,21 +1436,23 @@ async def handle_flight_historical_data(ctx: Context, sender: str, msg: FlightHi
 @insurance_protocol.on_message(model=FlightHistoricalRequest, replies={InsuranceRecommendation})
 async def handle_insurance_request(ctx: Context, sender: str, msg: FlightHistoricalRequest):
     """Handle direct insurance requests via protocol"""
+    global _requests_received
+    _requests_received += 1
     ctx.logger.info(f"Insurance request for flight: {msg.airline}{msg.flight_number} on {msg.date}")
     
     try:
         full_flight_id = f"{msg.airline}{msg.flight_number}-{msg.date}"
-        ctx.storage.set(f"pending_{full_flight_id}", sender)
+        _pending_requests.set(full_flight_id, sender)
         
-        # Forward to Historical Agent
-        await ctx.send(
-            FLIGHT_HISTORICAL_AGENT,
-            FlightHistoricalRequest(
-                airline=msg.airline,
-                flight_number=msg.flight_number,
-                date=msg.date
-            )
-        )
+        cached = _flight_cache.get((msg.airline, msg.flight_number, msg.date))
+        if cached is not None:
+            ctx.logger.info(f"Using cached historical data for {msg.airline}{msg.flight_number} on {msg.date}")
+            await process_flight_data(ctx, cached)
+            return
+        
+        # Forward to Historical Agent (the request was validated on receipt and
+        # has the same schema, so it is passed on as is)
+        await ctx.send(FLIGHT_HISTORICAL_AGENT, msg)
         
     except Exception as e:
         ctx.logger.error(f"Error processing insurance request: {e}")
@@ -1280,43 +1470,111 @@ async def handle_insurance_request(ctx: Context, sender: str, msg: FlightHistori
         await ctx.send(sender, recommendation)
 
 
-@insurance_agent.on_interval(period=120.0)
+async def warm_knowledge_graph(ctx: Context):
+    """Build the MeTTa knowledge graph before the first request arrives"""
+    if METTA_AVAILABLE and get_insurance_rag() is not None:
+        ctx.logger.info("MeTTa knowledge graph ready")
+
+
+# Status lines, formatted once; only the request count and address vary per tick
+_STATUS_RUNNING = "TravelSure Insurance Agent is running... (%d requests received)"
+_STATUS_ADDRESS = "Agent Address: %s"
+_STATUS_HISTORICAL_AGENT = f"Connected to Flight Historical Agent: {FLIGHT_HISTORICAL_AGENT}"
+
+
 async def log_status(ctx: Context):
-    """Periodic status logging"""
-    ctx.logger.info("TravelSure Insurance Agent is running...")
-    ctx.logger.info(f"Agent Address: {insurance_agent.address}")
-    ctx.logger.info(f"Connected to Flight Historical Agent: {FLIGHT_HISTORICAL_AGENT}")
+    """Periodic status logging; skipped while no new requests have arrived since the last one"""
+    global _requests_at_last_status
+    if _requests_received == _requests_at_last_status:
+        return
+    _requests_at_last_status = _requests_received
+    
+    ctx.logger.info(_STATUS_RUNNING, _requests_received)
+    ctx.logger.info(_STATUS_ADDRESS, ctx.agent.address)
+    ctx.logger.info(_STATUS_HISTORICAL_AGENT)
 
 
-# Include both protocols
-insurance_agent.include(insurance_protocol, publish_manifest=True)
+# ========================================
+# AGENT
+# ========================================
+
+@functools.cache
+def get_insurance_agent() -> Agent:
+    """
+    Build the insurance agent on first call and register its handlers and protocols
+    
+    Constructing the Agent derives its identity and sets up mailbox and resolver
+    clients, so it is deferred until the agent is actually run rather than paid
+    by every import of this module.
+    """
+    # Initialize the insurance recommendation agent with ASI-1 metadata
+    agent = Agent(
+        name="TravelSure-Insurance-Advisor",
+        seed="insurance_advisor_secure_seed_phrase_change_this",
+        mailbox=True,
+        port=8000,  # Use port 8001 to avoid conflict with Flight Historical Agent
+        # Weather responses must be handled while an analysis is waiting for them
+        handle_messages_concurrently=True,
+    )
+    
+    # # Add metadata for ASI-1 discoverability
+    # agent.metadata = {
+    #     "name": "TravelSure Insurance Advisor",
+    #     "description": "AI-powered flight insurance recommendation agent using MeTTa knowledge graphs, historical flight data, and weather analysis to suggest optimal delay insurance thresholds",
+    #     "tags": ["insurance", "flight", "travel", "risk-analysis", "metta", "ai", "weather", "delay-protection"],
+    #     "version": "1.0.0",
+    #     "author": "TravelSure Team",
+    #     "capabilities": [
+    #         "Flight insurance recommendations",
+    #         "Historical flight data analysis",
+    #         "Weather-aware risk assessment",
+    #         "Multi-factor AI reasoning",
+    #         "Time-threshold insurance options",
+    #         "Smart contract integration"
+    #     ],
+    #     "protocols": ["chat", "insurance_recommendation"],
+    #     "endpoints": {
+    #         "chat": "Supports Agentverse chat protocol for natural language insurance queries",
+    #         "insurance_api": "Direct protocol-based insurance recommendations"
+    #     }
+    # }
+    
+    agent.on_message(model=WeatherResponse)(handle_weather_data)
+    agent.on_message(model=FlightHistoricalResponse)(handle_flight_historical_data)
+    agent.on_event("startup")(warm_knowledge_graph)
+    agent.on_interval(period=120.0)(log_status)
+    
+    # Include both protocols
+    agent.include(insurance_protocol, publish_manifest=True)
+    if CHAT_PROTOCOL_AVAILABLE and chat_protocol:
+        agent.include(chat_protocol, publish_manifest=True)
+    
+    return agent
 
-if CHAT_PROTOCOL_AVAILABLE and chat_protocol:
-    insurance_agent.include(chat_protocol, publish_manifest=True)
-    chat_status = "ENABLED ✓"
-else:
-    chat_status = "DISABLED (uagents_core not available)"
-
-# Print agent information
-print("="*70)
-print("TravelSure Insurance Advisor Agent - ENHANCED WITH METTA")
-print("="*70)
-print(f"Agent Address: {insurance_agent.address}")
-print(f"Port: 8000")
-print(f"Chat Protocol: {chat_status}")
-print(f"Connected to Flight Historical Agent: {FLIGHT_HISTORICAL_AGENT}")
-print(f"Connected to Weather Agent: {WEATHER_AGENT}")
-print(f"\nEnhanced Features:")
-print(f"  ✅ Multi-factor AI analysis")
-print(f"  ✅ Real-time schedule + historical performance")
-print(f"  ✅ Weather-aware recommendations")
-print(f"  ✅ Airport congestion analysis")
-print(f"  ✅ Seasonal risk pattern detection")
-print(f"  ✅ MeTTa knowledge graph reasoning")
-print(f"  ✅ Intelligent threshold recommendations")
-print(f"  ✅ Risk adjustment calculations")
-print(f"  ✅ Agentverse chat interface")
-print("="*70)
 
 if __name__ == "__main__":
+    insurance_agent = get_insurance_agent()
+    chat_status = "ENABLED ✓" if CHAT_PROTOCOL_AVAILABLE and chat_protocol else "DISABLED (uagents_core not available)"
+    
+    # Print agent information
+    print("="*70)
+    print("TravelSure Insurance Advisor Agent - ENHANCED WITH METTA")
+    print("="*70)
+    print(f"Agent Address: {insurance_agent.address}")
+    print(f"Port: 8000")
+    print(f"Chat Protocol: {chat_status}")
+    print(f"Connected to Flight Historical Agent: {FLIGHT_HISTORICAL_AGENT}")
+    print(f"Connected to Weather Agent: {WEATHER_AGENT}")
+    print(f"\nEnhanced Features:")
+    print(f"  ✅ Multi-factor AI analysis")
+    print(f"  ✅ Real-time schedule + historical performance")
+    print(f"  ✅ Weather-aware recommendations")
+    print(f"  ✅ Airport congestion analysis")
+    print(f"  ✅ Seasonal risk pattern detection")
+    print(f"  ✅ MeTTa knowledge graph reasoning")
+    print(f"  ✅ Intelligent threshold recommendations")
+    print(f"  ✅ Risk adjustment calculations")
+    print(f"  ✅ Agentverse chat interface")
+    print("="*70)
+    
     insurance_agent.run()
@@ -7,9 +7,18 @@ This agent is used by the insurance agent to analyze flight reliability.
 from uagents import Agent, Context, Model, Protocol
 import aiohttp
 import asyncio
+from bisect import bisect_right
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
+# orjson parses the API payloads considerably faster than the stdlib json module
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    import json
+    json_loads = json.loads
+
 # Message Models
 class FlightHistoricalRequest(Model):
     """Request model for comprehensive flight data"""
@@ -58,6 +67,57 @@ class FlightHistoricalResponse(Model):
 SCHEDULE_API = "https://flightdelay.app/api/flightstats/schedule"
 QUOTE_API = "https://flightdelay.app/api/quote"
 
+# Risk classification: risk_score < 0.15 -> LOW, < 0.30 -> MEDIUM, otherwise HIGH
+RISK_THRESHOLDS = (0.15, 0.30)
+RISK_LEVELS = (
+    ("LOW", "Excellent on-time performance. Low risk flight."),
+    ("MEDIUM", "Good performance with occasional delays. Consider insurance."),
+    ("HIGH", "Frequent delays or disruptions. Insurance recommended."),
+)
+
+
+def parse_date(date: str) -> datetime:
+    """Parse a YYYY-MM-DD date; canonical dates take the C fromisoformat path instead of strptime"""
+    if len(date) == 10 and date[4] == '-' and date[7] == '-':
+        return datetime.fromisoformat(date)
+    return datetime.strptime(date, "%Y-%m-%d")
+
+
+# Shared HTTP session so repeated lookups reuse pooled keep-alive connections
+# instead of paying a new TLS handshake per request
+_session: Optional[aiohttp.ClientSession] = None
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """Return the agent-wide aiohttp session, creating it on first use"""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=32, ttl_dns_cache=300, keepalive_timeout=60)
+        )
+    return _session
+
+
+async def read_json(response) -> Optional[Any]:
+    """
+    Decode a successful API response and release its connection back to the pool
+    
+    Args:
+        response: aiohttp response, or the exception raised while requesting it
+        
+    Returns:
+        Parsed JSON body, or None if the request failed or returned a non-200 status
+    """
+    if isinstance(response, Exception):
+        return None
+    try:
+        if response.status != 200:
+            return None
+        return await response.json(loads=json_loads)
+    finally:
+        response.release()
+
+
 # Initialize the agent
 historical_agent = Agent(
     name="TravelSure-Flight-Historical",
@@ -88,7 +148,7 @@ async def fetch_comprehensive_data(airline: str, flight_number: str, date: str)
         
         # Validate date
         try:
-            datetime.strptime(date, "%Y-%m-%d")
+            parse_date(date)
         except ValueError:
             return {
                 "success": False,
@@ -101,128 +161,119 @@ async def fetch_comprehensive_data(airline: str, flight_number: str, date: str)
         print(f"[Historical] Fetching schedule from: {schedule_url}")
         print(f"[Historical] Fetching quote from: {quote_url}")
         
-        async with aiohttp.ClientSession() as session:
-            # Fetch both APIs in parallel
-            schedule_task = session.get(
-                schedule_url,
-                timeout=aiohttp.ClientTimeout(total=15),
-                headers={'Accept': 'application/json'}
-            )
-            quote_task = session.get(
-                quote_url,
-                timeout=aiohttp.ClientTimeout(total=15),
-                headers={'Accept': 'application/json'}
-            )
-            
-            schedule_response, quote_response = await asyncio.gather(
-                schedule_task, quote_task, return_exceptions=True
-            )
-            
-            # Process schedule data
-            schedule_data = None
-            if not isinstance(schedule_response, Exception) and schedule_response.status == 200:
-                schedule_data = await schedule_response.json()
-                print("[Historical] ✅ Schedule data retrieved")
-            else:
-                print(f"[Historical] ⚠️ Schedule fetch failed")
-            
-            # Process quote data
-            quote_data = None
-            if not isinstance(quote_response, Exception) and quote_response.status == 200:
-                quote_data = await quote_response.json()
-                print("[Historical] ✅ Quote data retrieved")
-            else:
-                print(f"[Historical] ⚠️ Quote fetch failed")
-            
-            # Check if we got at least one response
-            if not schedule_data and not quote_data:
-                return {
-                    "success": False,
-                    "error": "Failed to fetch both schedule and quote data"
-                }
-            
-            # Extract schedule information
-            departure_time = None
-            arrival_time = None
-            origin_city = None
-            origin_iata = None
-            destination_city = None
-            destination_iata = None
+        session = await get_session()
+        
+        # Fetch both APIs in parallel
+        schedule_task = session.get(
+            schedule_url,
+            timeout=aiohttp.ClientTimeout(total=15),
+            headers={'Accept': 'application/json'}
+        )
+        quote_task = session.get(
+            quote_url,
+            timeout=aiohttp.ClientTimeout(total=15),
+            headers={'Accept': 'application/json'}
+        )
+        
+        schedule_response, quote_response = await asyncio.gather(
+            schedule_task, quote_task, return_exceptions=True
+        )
+        
+        # Process schedule data
+        schedule_data = await read_json(schedule_response)
+        if schedule_data is not None:
+            print("[Historical] ✅ Schedule data retrieved")
+        else:
+            print(f"[Historical] ⚠️ Schedule fetch failed")
+        
+        # Process quote data
+        quote_data = await read_json(quote_response)
+        if quote_data is not None:
+            print("[Historical] ✅ Quote data retrieved")
+        else:
+            print(f"[Historical] ⚠️ Quote fetch failed")
+        
+        # Check if we got at least one response
+        if not schedule_data and not quote_data:
+            return {
+                "success": False,
+                "error": "Failed to fetch both schedule and quote data"
+            }
+        
+        # Extract schedule information
+        departure_time = None
+        arrival_time = None
+        origin_city = None
+        origin_iata = None
+        destination_city = None
+        destination_iata = None
+        
+        if schedule_data:
+            scheduled_flights = schedule_data.get('scheduledFlights', [])
+            airports = schedule_data.get('appendix', {}).get('airports', [])
             
-            if schedule_data:
-                scheduled_flights = schedule_data.get('scheduledFlights', [])
-                airports = schedule_data.get('appendix', {}).get('airports', [])
+            if scheduled_flights:
+                flight = scheduled_flights[0]
+                departure_time = flight.get('departureTime')
+                arrival_time = flight.get('arrivalTime')
                 
-                if scheduled_flights:
-                    flight = scheduled_flights[0]
-                    departure_time = flight.get('departureTime')
-                    arrival_time = flight.get('arrivalTime')
-                    
-                    # Find airport details
-                    dep_code = flight.get('departureAirportFsCode')
-                    arr_code = flight.get('arrivalAirportFsCode')
-                    
-                    for airport in airports:
-                        if airport.get('fs') == dep_code:
-                            origin_city = airport.get('city')
-                            origin_iata = airport.get('iata')
-                        if airport.get('fs') == arr_code:
-                            destination_city = airport.get('city')
-                            destination_iata = airport.get('iata')
-            
-            # Extract quote/statistics information
-            ontime_percent = None
-            statistics = [0, 0, 0, 0]
-            suggested_premium = None
-            
-            if quote_data:
-                ontime_percent = quote_data.get('ontimepercent', 0.0)
-                statistics = quote_data.get('statistics', [0, 0, 0, 0])
-                suggested_premium = quote_data.get('premium', 0.0)
+                # Find airport details
+                dep_code = flight.get('departureAirportFsCode')
+                arr_code = flight.get('arrivalAirportFsCode')
                 
-                while len(statistics) < 4:
-                    statistics.append(0)
-            
-            total_flights = sum(statistics)
-            
-            # Calculate risk assessment
-            risk_score = 1.0 - ontime_percent if ontime_percent else 0.5
-            
-            if risk_score < 0.15:
-                delay_risk = "LOW"
-                recommendation = "Excellent on-time performance. Low risk flight."
-            elif risk_score < 0.30:
-                delay_risk = "MEDIUM"
-                recommendation = "Good performance with occasional delays. Consider insurance."
-            else:
-                delay_risk = "HIGH"
-                recommendation = "Frequent delays or disruptions. Insurance recommended."
-            
-            print(f"[Historical] Analysis complete - Risk: {delay_risk}, On-time: {ontime_percent*100 if ontime_percent else 0:.1f}%")
-            
-            return {
-                "success": True,
-                "airline": airline,
-                "flight_number": flight_number,
-                "date": date,
-                "departure_time": departure_time,
-                "arrival_time": arrival_time,
-                "origin_city": origin_city,
-                "origin_iata": origin_iata,
-                "destination_city": destination_city,
-                "destination_iata": destination_iata,
-                "ontime_percent": ontime_percent,
-                "delay_risk": delay_risk,
-                "total_historical_flights": total_flights,
-                "ontime_count": statistics[0],
-                "delayed_count": statistics[1],
-                "cancelled_count": statistics[2],
-                "diverted_count": statistics[3],
-                "suggested_premium": suggested_premium,
-                "risk_score": risk_score,
-                "recommendation": recommendation
-            }
+                for airport in airports:
+                    if airport.get('fs') == dep_code:
+                        origin_city = airport.get('city')
+                        origin_iata = airport.get('iata')
+                    if airport.get('fs') == arr_code:
+                        destination_city = airport.get('city')
+                        destination_iata = airport.get('iata')
+        
+        # Extract quote/statistics information
+        ontime_percent = None
+        statistics = [0, 0, 0, 0]
+        suggested_premium = None
+        
+        if quote_data:
+            ontime_percent = quote_data.get('ontimepercent', 0.0)
+            statistics = quote_data.get('statistics', [0, 0, 0, 0])
+            suggested_premium = quote_data.get('premium', 0.0)
             
+            while len(statistics) < 4:
+                statistics.append(0)
+        
+        total_flights = sum(statistics)
+        
+        # Calculate risk assessment
+        risk_score = 1.0 - ontime_percent if ontime_percent else 0.5
+        
+        delay_risk, recommendation = RISK_LEVELS[bisect_right(RISK_THRESHOLDS, risk_score)]
+        
+        print(f"[Historical] Analysis complete - Risk: {delay_risk}, On-time: {ontime_percent*100 if ontime_percent else 0:.1f}%")
+        
+        return {
+            "success": True,
+            "airline": airline,
+            "flight_number": flight_number,
+            "date": date,
+            "departure_time": departure_time,
+            "arrival_time": arrival_time,
+            "origin_city": origin_city,
+            "origin_iata": origin_iata,
+            "destination_city": destination_city,
+            "destination_iata": destination_iata,
+            "ontime_percent": ontime_percent,
+            "delay_risk": delay_risk,
+            "total_historical_flights": total_flights,
+            "ontime_count": statistics[0],
+            "delayed_count": statistics[1],
+            "cancelled_count": statistics[2],
+            "diverted_count": statistics[3],
+            "suggested_premium": suggested_premium,
+            "risk_score": risk_score,
+            "recommendation": recommendation
+        }
+        
     except asyncio.TimeoutError:
         return {
             "success": False,
@@ -291,5 +342,12 @@ async def on_startup(ctx: Context):
     ctx.logger.info("Waiting for requests...")
 
 
+@historical_agent.on_event("shutdown")
+async def on_shutdown(ctx: Context):
+    """Close the shared HTTP session"""
+    if _session is not None and not _session.closed:
+        await _session.close()
+
+
 if __name__ == "__main__":
     historical_agent.run()
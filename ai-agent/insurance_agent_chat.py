@@ -5,14 +5,22 @@ Includes Agentverse Chat Protocol for direct chat in Agentverse dashboard.
 """
 
 from uagents import Agent, Context, Model, Protocol
+from bisect import bisect_right
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from uuid import uuid4
-from typing import Optional
+from types import MappingProxyType
+from uuid import UUID
+from typing import Mapping, Optional
 import os
+import functools
 import json
+import logging
 import re
-import traceback
 import asyncio
+import time
+
+# Module logger for the analysis helpers, which run without an agent Context
+logger = logging.getLogger(__name__)
 
 # Import MeTTa components
 try:
@@ -161,6 +169,8 @@ insurance_agent = Agent(
     seed="insurance_advisor_secure_seed_phrase_change_this",
     mailbox=True,
     port=8000,  # Use port 8001 to avoid conflict with Flight Historical Agent
+    # Weather responses must be handled while an analysis is waiting for them
+    handle_messages_concurrently=True,
 )
 
 # Add metadata for ASI-1 discoverability
@@ -209,7 +219,157 @@ if METTA_AVAILABLE:
         METTA_AVAILABLE = False
 
 
-def calculate_insurance_options(flight_data: FlightHistoricalResponse, base_premium: float, risk_score: float) -> list[dict]:
+class _TTLCache:
+    """Small LRU cache whose entries expire ttl seconds after they were stored"""
+    
+    def __init__(self, maxsize: int = 256, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+    
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if time.monotonic() - stored_at >= self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+    
+    def set(self, key, value):
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+    
+    def discard(self, key):
+        self._entries.pop(key, None)
+
+
+# Analyses keyed by every flight and weather field the analysis reads, so the same
+# flight asked about again under the same conditions skips the MeTTa reasoning.
+# The analysis dicts are shared between hits and must not be mutated.
+_analysis_cache = _TTLCache(maxsize=1024, ttl=300.0)
+
+
+def _analysis_key(flight_data: FlightHistoricalResponse, weather_data: Optional[dict]) -> tuple:
+    """Cache key for analyze_comprehensive_risk(flight_data, weather_data)"""
+    if weather_data:
+        weather_key = (weather_data.get("success"), weather_data.get("condition"), weather_data.get("delay_risk"))
+    else:
+        weather_key = None
+    return (
+        flight_data.airline, flight_data.flight_number, flight_data.date,
+        flight_data.ontime_percent, flight_data.delay_risk, flight_data.risk_score,
+        flight_data.suggested_premium, flight_data.total_historical_flights,
+        flight_data.delayed_count, flight_data.cancelled_count,
+        flight_data.origin_iata, flight_data.destination_iata,
+        flight_data.origin_city, flight_data.destination_city,
+        weather_key,
+    )
+
+
+# Finished analyses keyed by (airline, flight_number, date), holding the flight
+# data, route weather and analysis behind the last reply. Recommendations are
+# stable for minutes, so a repeat question is answered straight away without
+# any Historical Agent, Weather Agent or MeTTa work. Entries are shared between
+# hits and must not be mutated.
+_recommendation_cache = _TTLCache(maxsize=256, ttl=300.0)
+
+# In-flight request state keyed by flight id ("AA100-2025-10-20"): the chat
+# session awaiting a reply, and the sender of a pending protocol request. Kept in
+# memory rather than agent storage, and bounded, so abandoned requests age out
+# instead of accumulating as storage entries.
+_chat_sessions = _TTLCache(maxsize=4096, ttl=600.0)
+_pending_requests = _TTLCache(maxsize=4096, ttl=600.0)
+
+
+# Weather requests still waiting for a WeatherResponse, keyed by airport code.
+# handle_weather_data resolves the future, so an analysis resumes as soon as the
+# weather arrives instead of always sleeping for the worst case.
+_pending_weather: dict[str, asyncio.Future] = {}
+
+# Longest we wait for the Weather Agent before analyzing without fresh weather
+WEATHER_TIMEOUT = 2.0
+
+
+def _expect_weather(airport_code: str) -> asyncio.Future:
+    """Return the future resolved by the next WeatherResponse for airport_code"""
+    future = _pending_weather.get(airport_code)
+    if future is None or future.done():
+        future = asyncio.get_running_loop().create_future()
+        _pending_weather[airport_code] = future
+    return future
+
+
+def _weather_result(ctx: Context, airport_code: Optional[str], future: Optional[asyncio.Future]) -> Optional[dict]:
+    """Weather delivered to future, or the last stored weather for airport_code if it hasn't arrived"""
+    if not airport_code:
+        return None
+    if future is not None and future.done() and not future.cancelled():
+        return future.result()
+    return ctx.storage.get(f"weather_{airport_code}")
+
+
+def _policy_premium(payout: int, prob_bps: int, margin_bps: int, multiplier_bps: int) -> float:
+    """
+    Premium for a policy tier, mirroring PolicyManager.sol pricing
+    
+    premium = PricingLib.quote(payout, probBps, marginBps) * premiumMultiplierBps / 10000
+    PricingLib.quote = (payout * probBps / 10000) * (10000 + marginBps) / 10000
+    """
+    base = (payout * prob_bps / 10000) * (10000 + margin_bps) / 10000
+    return round((base * multiplier_bps) / 10000, 2)
+
+
+# Policy tiers matching PolicyManager.sol, ordered by threshold:
+# (option_type, name, payout, threshold label, tier, probBps, marginBps, premiumMultiplierBps)
+_TIER_PRICING = (
+    ("delay_1h", "1-Hour Threshold (Platinum)", 1000, "1 hour", "Platinum", 4000, 800, 15000),
+    ("delay_2h", "2-Hour Threshold (Gold)", 500, "2 hours", "Gold", 3500, 700, 15000),
+    ("delay_3h", "3-Hour Threshold (Silver)", 250, "3 hours", "Silver", 3200, 600, 12000),
+    ("delay_4h", "4-Hour Threshold (Basic)", 100, "4 hours", "Basic", 3000, 500, 10000),
+)
+
+# Delay-rate boundaries between the tiers above: <10% -> 1h, <20% -> 2h, <35% -> 3h, else 4h
+_DELAY_RATE_BANDS = (0.10, 0.20, 0.35)
+
+# Every option with its premium, built once at import. All pricing inputs are
+# contract constants, so only "recommended" varies per flight. The options are
+# shared by every analysis, so they are read-only mappings and coverage_details
+# is a tuple.
+_OPTION_PROTOTYPES = tuple(
+    MappingProxyType({
+        "option_type": option_type,
+        "name": name,
+        "description": f"Claim ${payout} payout if delay exceeds {threshold}",
+        "coverage_details": (f"Payout: ${payout} PYUSD", f"Threshold: {threshold}", f"Tier: {tier}"),
+        "premium": _policy_premium(payout, prob_bps, margin_bps, multiplier_bps),
+    })
+    for option_type, name, payout, threshold, tier, prob_bps, margin_bps, multiplier_bps in _TIER_PRICING
+)
+
+# Option lookup by type, for the recommended option's premium
+_OPTIONS_BY_TYPE = {prototype["option_type"]: prototype for prototype in _OPTION_PROTOTYPES}
+
+# The complete option list for each delay band, with the recommended flag already set
+_OPTIONS_BY_BAND = tuple(
+    tuple(
+        MappingProxyType({**prototype, "recommended": index == band})
+        for index, prototype in enumerate(_OPTION_PROTOTYPES)
+    )
+    for band in range(len(_OPTION_PROTOTYPES))
+)
+
+
+def _delay_band(delay_rate: float) -> int:
+    """Index of the tier recommended for a delay rate, shared by pricing and the fallback"""
+    return bisect_right(_DELAY_RATE_BANDS, delay_rate)
+
+
+def calculate_insurance_options(flight_data: FlightHistoricalResponse, base_premium: float, risk_score: float) -> tuple[Mapping, ...]:
     """
     Calculate all available insurance options with pricing matching PolicyManager.sol
     
@@ -219,70 +379,12 @@ def calculate_insurance_options(flight_data: FlightHistoricalResponse, base_prem
         risk_score: Risk score (0.0 to 1.0)
         
     Returns:
-        List of insurance option dictionaries with smart contract pricing
+        Tuple of read-only insurance option mappings with smart contract pricing,
+        shared between calls
     """
-    options = []
-    
     # Calculate delay rate for recommendations
     delay_rate = 1 - (flight_data.ontime_percent if flight_data.ontime_percent else 0.5)
-    
-    # Smart Contract Pricing - matching PolicyManager.sol exactly
-    # Formula: premium = PricingLib.quote(payout, probBps, marginBps) * premiumMultiplierBps / 10000
-    # PricingLib.quote = (payout * probBps / 10000) * (10000 + marginBps) / 10000
-    
-    # 1-HOUR THRESHOLD (Platinum) - Smart contract pricing
-    # Config: payout=$1000, probBps=4000 (40%), marginBps=800 (8%), multiplier=15000 (1.5x)
-    platinum_base = (1000 * 4000 / 10000) * (10000 + 800) / 10000  # = 432
-    platinum_premium = (platinum_base * 15000) / 10000  # = 648.00
-    options.append({
-        "option_type": "delay_1h",
-        "name": "1-Hour Threshold (Platinum)",
-        "description": "Claim $1000 payout if delay exceeds 1 hour",
-        "coverage_details": ["Payout: $1000 PYUSD", "Threshold: 1 hour", "Tier: Platinum"],
-        "premium": round(platinum_premium, 2),
-        "recommended": delay_rate < 0.10  # Very reliable flights only
-    })
-    
-    # 2-HOUR THRESHOLD (Gold) - Smart contract pricing
-    # Config: payout=$500, probBps=3500 (35%), marginBps=700 (7%), multiplier=15000 (1.5x)
-    gold_base = (500 * 3500 / 10000) * (10000 + 700) / 10000  # = 187.25
-    gold_premium = (gold_base * 15000) / 10000  # = 280.88
-    options.append({
-        "option_type": "delay_2h",
-        "name": "2-Hour Threshold (Gold)",
-        "description": "Claim $500 payout if delay exceeds 2 hours",
-        "coverage_details": ["Payout: $500 PYUSD", "Threshold: 2 hours", "Tier: Gold"],
-        "premium": round(gold_premium, 2),
-        "recommended": delay_rate >= 0.10 and delay_rate < 0.20  # Good reliability
-    })
-    
-    # 3-HOUR THRESHOLD (Silver) - Smart contract pricing
-    # Config: payout=$250, probBps=3200 (32%), marginBps=600 (6%), multiplier=12000 (1.2x)
-    silver_base = (250 * 3200 / 10000) * (10000 + 600) / 10000  # = 84.8
-    silver_premium = (silver_base * 12000) / 10000  # = 101.76
-    options.append({
-        "option_type": "delay_3h",
-        "name": "3-Hour Threshold (Silver)",
-        "description": "Claim $250 payout if delay exceeds 3 hours",
-        "coverage_details": ["Payout: $250 PYUSD", "Threshold: 3 hours", "Tier: Silver"],
-        "premium": round(silver_premium, 2),
-        "recommended": delay_rate >= 0.20 and delay_rate < 0.35  # Moderate reliability
-    })
-    
-    # 4-HOUR THRESHOLD (Basic) - Smart contract pricing
-    # Config: payout=$100, probBps=3000 (30%), marginBps=500 (5%), multiplier=10000 (1.0x)
-    basic_base = (100 * 3000 / 10000) * (10000 + 500) / 10000  # = 31.5
-    basic_premium = (basic_base * 10000) / 10000  # = 31.50
-    options.append({
-        "option_type": "delay_4h",
-        "name": "4-Hour Threshold (Basic)",
-        "description": "Claim $100 payout if delay exceeds 4 hours",
-        "coverage_details": ["Payout: $100 PYUSD", "Threshold: 4 hours", "Tier: Basic"],
-        "premium": round(basic_premium, 2),
-        "recommended": delay_rate >= 0.35  # Less reliable flights
-    })
-    
-    return options
+    return _OPTIONS_BY_BAND[_delay_band(delay_rate)]
 
 
 def analyze_comprehensive_risk(flight_data: FlightHistoricalResponse, weather_data: Optional[dict] = None, use_metta: bool = True) -> dict:
@@ -298,11 +400,14 @@ def analyze_comprehensive_risk(flight_data: FlightHistoricalResponse, weather_da
         Dictionary with recommendation, confidence, reasoning, and insurance options
     """
     risk_factors = []
+    # Contextual factor categories already present, so they aren't added twice
+    categories_added = set()
     
     # Use the risk assessment from Historical Agent
     risk_score = flight_data.risk_score if flight_data.risk_score else 0.5
     delay_risk = flight_data.delay_risk if flight_data.delay_risk else "MEDIUM"
     ontime_percent = flight_data.ontime_percent if flight_data.ontime_percent else 0.5
+    ontime_display = f"{ontime_percent*100:.1f}"  # Shared by the reasoning and risk factors
     
     # Calculate base premium
     if flight_data.suggested_premium:
@@ -321,26 +426,28 @@ def analyze_comprehensive_risk(flight_data: FlightHistoricalResponse, weather_da
     # ========================================
     if use_metta and METTA_AVAILABLE and insurance_rag:
         try:
-            # Prepare comprehensive data for MeTTa analysis
+            # Pass weather condition even if not marked as fully successful
+            weather_condition = weather_data.get("condition") if weather_data else None
+            if not weather_condition and weather_data and weather_data.get("success"):
+                # If marked successful but no condition, use 'clear' as default
+                weather_condition = weather_data.get("condition", "clear")
+            
+            # Prepare comprehensive data for MeTTa analysis; unset fields are left
+            # out so InsuranceRAG applies its own defaults
             metta_input = {
-                'ontime_percent': ontime_percent,
-                'origin_iata': flight_data.origin_iata,
-                'destination_iata': flight_data.destination_iata,
-                'date': flight_data.date,
-                'cancelled_count': flight_data.cancelled_count if flight_data.cancelled_count else 0,
-                'total_historical_flights': flight_data.total_historical_flights
+                key: value
+                for key, value in (
+                    ('ontime_percent', ontime_percent),
+                    ('origin_iata', flight_data.origin_iata),
+                    ('destination_iata', flight_data.destination_iata),
+                    ('date', flight_data.date),
+                    ('cancelled_count', flight_data.cancelled_count),
+                    ('total_historical_flights', flight_data.total_historical_flights),
+                    ('weather_condition', weather_condition),
+                )
+                if value is not None
             }
             
-            # Add weather data if available
-            if weather_data:
-                # Pass weather condition even if not marked as fully successful
-                condition = weather_data.get("condition")
-                if condition:
-                    metta_input['weather_condition'] = condition
-                elif weather_data.get("success"):
-                    # If marked successful but no condition, use 'clear' as default
-                    metta_input['weather_condition'] = weather_data.get("condition", "clear")
-            
             # Get comprehensive MeTTa recommendation with multi-factor reasoning
             metta_result = insurance_rag.get_comprehensive_recommendation(metta_input)
             
@@ -350,31 +457,34 @@ def analyze_comprehensive_risk(flight_data: FlightHistoricalResponse, weather_da
             confidence = metta_result.get('confidence', 0.80)
             
             # Use MeTTa's identified risk factors
-            risk_factors.extend(metta_result.get('risk_factors', []))
+            for factor in metta_result.get('risk_factors', []):
+                risk_factors.append(factor)
+                if str(factor).startswith("Cancellation history"):
+                    categories_added.add("cancellation")
+                elif str(factor).startswith("Route:"):
+                    categories_added.add("route")
             
-            print(f"[MeTTa] Comprehensive analysis complete: {recommendation} (confidence: {confidence:.2f})")
-            print(f"[MeTTa] Risk adjustments applied: {metta_result.get('risk_adjustments_applied', 0):.2f}")
+            logger.info("[MeTTa] Comprehensive analysis complete: %s (confidence: %.2f)", recommendation, confidence)
+            logger.info("[MeTTa] Risk adjustments applied: %.2f", metta_result.get('risk_adjustments_applied', 0))
                 
         except Exception as e:
-            print(f"MeTTa comprehensive reasoning failed, using fallback: {e}")
-            import traceback
-            traceback.print_exc()
-            recommendation, base_reasoning = _fallback_recommendation(delay_rate, ontime_percent, delay_risk)
+            logger.exception("MeTTa comprehensive reasoning failed, using fallback: %s", e)
+            recommendation, base_reasoning = _fallback_recommendation(delay_rate, ontime_percent, delay_risk, ontime_display)
             confidence = 0.75
     else:
         # Fallback logic when MeTTa not available
-        recommendation, base_reasoning = _fallback_recommendation(delay_rate, ontime_percent, delay_risk)
+        recommendation, base_reasoning = _fallback_recommendation(delay_rate, ontime_percent, delay_risk, ontime_display)
         confidence = 0.75
         
         # Manual risk factor building for fallback
         if delay_rate < 0.15:
-            risk_factors.append(f"Excellent on-time record: {ontime_percent*100:.1f}%")
+            risk_factors.append(f"Excellent on-time record: {ontime_display}%")
         elif delay_rate < 0.25:
-            risk_factors.append(f"Good on-time rate: {ontime_percent*100:.1f}%")
+            risk_factors.append(f"Good on-time rate: {ontime_display}%")
             if flight_data.delayed_count:
                 risk_factors.append(f"Past delays: {flight_data.delayed_count} recorded")
         else:
-            risk_factors.append(f"Historical on-time rate: {ontime_percent*100:.1f}%")
+            risk_factors.append(f"Historical on-time rate: {ontime_display}%")
             if flight_data.delayed_count:
                 risk_factors.append(f"Delay history: {flight_data.delayed_count} delays")
         
@@ -389,33 +499,28 @@ def analyze_comprehensive_risk(flight_data: FlightHistoricalResponse, weather_da
             elif weather_risk == "LOW":
                 base_reasoning += f" Clear weather ({weather_condition}) reduces delay concerns."
     
-    # Use the reasoning from MeTTa or fallback
-    full_reasoning = base_reasoning
-    # Use the reasoning from MeTTa or fallback
-    full_reasoning = base_reasoning
-    
     # ========================================
     # ADD ADDITIONAL CONTEXTUAL RISK FACTORS
     # ========================================
     
     # Add cancellation info if relevant
     if flight_data.cancelled_count and flight_data.cancelled_count > 0:
-        if f"Cancellation history" not in str(risk_factors):  # Avoid duplicates from MeTTa
+        if "cancellation" not in categories_added:  # Avoid duplicates from MeTTa
             risk_factors.append(f"Cancellation history: {flight_data.cancelled_count} cancellations recorded")
     
     # Add route information
     if flight_data.origin_city and flight_data.destination_city:
-        if not any("Route:" in str(rf) for rf in risk_factors):  # Avoid duplicates
+        if "route" not in categories_added:  # Avoid duplicates
             risk_factors.append(f"Route: {flight_data.origin_city} → {flight_data.destination_city}")
     
     # Find the recommended option's premium
-    recommended_option = next((opt for opt in insurance_options if opt["option_type"] == recommendation), None)
+    recommended_option = _OPTIONS_BY_TYPE.get(recommendation)
     estimated_premium = recommended_option["premium"] if recommended_option else base_premium
     
     return {
         "recommendation": recommendation,
         "confidence": confidence,
-        "reasoning": full_reasoning,
+        "reasoning": base_reasoning,  # From MeTTa or the fallback
         "risk_factors": risk_factors,
         "estimated_premium": estimated_premium,
         "risk_level": delay_risk,
@@ -424,125 +529,105 @@ def analyze_comprehensive_risk(flight_data: FlightHistoricalResponse, weather_da
     }
 
 
-def _fallback_recommendation(delay_rate: float, ontime_percent: float, delay_risk: str) -> tuple[str, str]:
-    """Fallback recommendation logic when MeTTa is not available"""
+def analyze_comprehensive_risk_batch(flight_datas: list[FlightHistoricalResponse], weather_datas: Optional[list[Optional[dict]]] = None, use_metta: bool = True) -> list[dict]:
+    """
+    Analyze several flights at once, e.g. for a multi-leg itinerary
     
-    if delay_rate < 0.15:
-        # Excellent reliability - recommend 2-hour threshold
-        # Flight rarely delays, so if it does delay, it's unexpected
-        recommendation = "delay_2h"
-        confidence = 0.90
-        reasoning = f"This flight has excellent {delay_risk} risk with {ontime_percent*100:.1f}% on-time performance. 2-hour threshold recommended - flight is highly reliable, so coverage for any delay provides peace of mind."
-        
-        risk_factors.append(f"Excellent on-time record: {ontime_percent*100:.1f}%")
-        risk_factors.append(f"Low historical delays - any delay would be unusual")
-        
-    elif delay_rate < 0.25:
-        # Good reliability - recommend 4-hour threshold
-        recommendation = "delay_4h"
-        confidence = 0.85
-        reasoning = f"This flight has good {delay_risk} risk with {ontime_percent*100:.1f}% on-time performance. 4-hour threshold recommended for balanced protection."
-        
-        risk_factors.append(f"Good on-time rate: {ontime_percent*100:.1f}%")
-        
-        if flight_data.delayed_count:
-            risk_factors.append(f"Past delays: {flight_data.delayed_count} recorded")
-    
-    elif delay_rate < 0.35:
-        # Moderate delays - recommend 6-hour threshold
-        recommendation = "delay_6h"
-        confidence = 0.80
-        reasoning = f"This flight has {delay_risk} risk with {ontime_percent*100:.1f}% on-time performance. 6-hour threshold recommended - moderate delay history suggests coverage for significant delays."
-        
-        risk_factors.append(f"Historical on-time rate: {ontime_percent*100:.1f}%")
-        
-        if flight_data.delayed_count and flight_data.total_historical_flights:
-            delay_rate_percent = (flight_data.delayed_count / flight_data.total_historical_flights) * 100
-            risk_factors.append(f"Delay rate: {delay_rate_percent:.1f}% based on {flight_data.total_historical_flights} flights")
-    
-    elif delay_rate < 0.5:
-        # Frequent delays - recommend 8-hour threshold
-        recommendation = "delay_8h"
-        confidence = 0.85
-        reasoning = f"This flight has {delay_risk} risk with {ontime_percent*100:.1f}% on-time performance. 8-hour threshold recommended - frequent delay history means coverage for extended delays is valuable."
-        
-        if flight_data.delayed_count and flight_data.total_historical_flights:
-            delay_rate_percent = (flight_data.delayed_count / flight_data.total_historical_flights) * 100
-            risk_factors.append(f"High delay rate: {delay_rate_percent:.1f}% based on {flight_data.total_historical_flights} flights")
-        
-        risk_factors.append(f"Flight often experiences delays")
-            
-    else:
-        # Very frequent delays - recommend 12-hour threshold
-        recommendation = "delay_12h"
-        confidence = 0.90
-        reasoning = f"This flight has {delay_risk} risk with {ontime_percent*100:.1f}% on-time performance. 12-hour threshold recommended - flight frequently delayed, focus on extreme delay protection."
-        
-        if flight_data.delayed_count and flight_data.total_historical_flights:
-            delay_rate_percent = (flight_data.delayed_count / flight_data.total_historical_flights) * 100
-            risk_factors.append(f"Very high delay rate: {delay_rate_percent:.1f}% based on {flight_data.total_historical_flights} flights")
-        
-        risk_factors.append(f"Flight has significant delay history")
+    Args:
+        flight_datas: FlightHistoricalResponse per flight
+        weather_datas: Optional weather data per flight, aligned with flight_datas
+        use_metta: Whether to use MeTTa for enhanced reasoning
         
-    # Add cancellation info if relevant
-    if flight_data.cancelled_count and flight_data.cancelled_count > 0:
-        risk_factors.append(f"Cancellation history: {flight_data.cancelled_count} cancellations recorded")
-    
-    # Add route information
-    if flight_data.origin_city and flight_data.destination_city:
-        risk_factors.append(f"Route: {flight_data.origin_city} → {flight_data.destination_city}")
-    
-    # Find the recommended option's premium
-    recommended_option = next((opt for opt in insurance_options if opt["option_type"] == recommendation), None)
-    estimated_premium = recommended_option["premium"] if recommended_option else base_premium
-    
-    return {
-        "recommendation": recommendation,
-        "confidence": confidence,
-        "reasoning": reasoning,
-        "risk_factors": risk_factors,
-        "estimated_premium": estimated_premium,
-        "risk_level": delay_risk,
-        "route": f"{flight_data.origin_iata or 'UNK'} → {flight_data.destination_iata or 'UNK'}",
-        "insurance_options": insurance_options
-    }
+    Returns:
+        One analysis dictionary per flight, in input order. Identical flights
+        share the same dictionary, which must not be mutated.
+    """
+    if weather_datas is None:
+        weather_datas = [None] * len(flight_datas)
+    elif len(weather_datas) != len(flight_datas):
+        raise ValueError("weather_datas must have one entry per flight")
+    
+    # Check MeTTa availability once for the whole batch
+    use_metta = use_metta and METTA_AVAILABLE and insurance_rag is not None
+    
+    # Bulk scoring of booked flights repeats the same flight many times; analyze
+    # each distinct flight/weather combination once and share the result
+    analyses = {}
+    results = []
+    for flight_data, weather_data in zip(flight_datas, weather_datas):
+        key = _analysis_key(flight_data, weather_data)
+        analysis = analyses.get(key)
+        if analysis is None:
+            analysis = analyses[key] = analyze_comprehensive_risk(flight_data, weather_data=weather_data, use_metta=use_metta)
+        results.append(analysis)
+    return results
+
+
+# Fallback (recommendation, reasoning template) per delay band (see _DELAY_RATE_BANDS)
+_FALLBACK_BY_BAND = (
+    # Excellent reliability - recommend 1-hour threshold (Platinum)
+    ("delay_1h", "Excellent {delay_risk} risk with {ontime}% on-time performance. 1-hour Platinum threshold recommended for highly reliable flights."),
+    # Very good reliability - recommend 2-hour threshold (Gold)
+    ("delay_2h", "Very good {delay_risk} risk with {ontime}% on-time performance. 2-hour Gold threshold recommended."),
+    # Moderate reliability - recommend 3-hour threshold (Silver)
+    ("delay_3h", "{delay_risk} risk with {ontime}% on-time performance. 3-hour Silver threshold recommended for balanced protection."),
+    # Lower reliability - recommend 4-hour threshold (Basic)
+    ("delay_4h", "{delay_risk} risk with {ontime}% on-time performance. 4-hour Basic threshold recommended - cost-effective coverage."),
+)
 
 
-def _fallback_recommendation(delay_rate: float, ontime_percent: float, delay_risk: str) -> tuple[str, str]:
-    """Fallback recommendation logic when MeTTa is not available"""
-    
-    if delay_rate < 0.10:
-        # Excellent reliability - recommend 1-hour threshold (Platinum)
-        recommendation = "delay_1h"
-        reasoning = f"Excellent {delay_risk} risk with {ontime_percent*100:.1f}% on-time performance. 1-hour Platinum threshold recommended for highly reliable flights."
-    elif delay_rate < 0.20:
-        # Very good reliability - recommend 2-hour threshold (Gold)
-        recommendation = "delay_2h"
-        reasoning = f"Very good {delay_risk} risk with {ontime_percent*100:.1f}% on-time performance. 2-hour Gold threshold recommended."
-    elif delay_rate < 0.35:
-        # Moderate reliability - recommend 3-hour threshold (Silver)
-        recommendation = "delay_3h"
-        reasoning = f"{delay_risk} risk with {ontime_percent*100:.1f}% on-time performance. 3-hour Silver threshold recommended for balanced protection."
-    else:
-        # Lower reliability - recommend 4-hour threshold (Basic)
-        recommendation = "delay_4h"
-        reasoning = f"{delay_risk} risk with {ontime_percent*100:.1f}% on-time performance. 4-hour Basic threshold recommended - cost-effective coverage."
+def _fallback_recommendation(delay_rate: float, ontime_percent: float, delay_risk: str, ontime_display: Optional[str] = None) -> tuple[str, str]:
+    """
+    Fallback recommendation logic when MeTTa is not available
     
-    return recommendation, reasoning
+    ontime_display is ontime_percent already formatted as a percentage ("82.0"),
+    if the caller has it.
+    """
+    if ontime_display is None:
+        ontime_display = f"{ontime_percent*100:.1f}"
+    recommendation, reasoning = _FALLBACK_BY_BAND[_delay_band(delay_rate)]
+    return recommendation, reasoning.format(delay_risk=delay_risk, ontime=ontime_display)
+
+
+# Flight input parsing patterns - compiled once at import
+# Shortest text _FLIGHT_PATTERN can match: a two-letter airline code and one digit ("AA1")
+_MIN_FLIGHT_TEXT = 3
+_FLIGHT_PATTERN = re.compile(r'\b([A-Z]{2})\s?(\d{1,4})\b')
+# Numeric dates in one scan; the group that matched tells the format apart
+_DATE_PATTERN = re.compile(
+    r'(?P<iso>\d{4}-\d{2}-\d{2})'  # YYYY-MM-DD
+    r'|(?P<us>(?P<us_month>\d{2})/(?P<us_day>\d{2})/(?P<us_year>\d{4}))'  # MM/DD/YYYY
+)
+# Relative dates, only used when the text has no explicit date
+_RELATIVE_DATE_PATTERN = re.compile(r'TODAY|TOMORROW')
 
+_ONE_DAY = timedelta(days=1)
 
-def parse_flight_input(text: str) -> Optional[tuple[str, str, str]]:
+# (day, today as YYYY-MM-DD, tomorrow as YYYY-MM-DD), reformatted when the day changes
+_relative_dates_cache = (None, "", "")
+
+
+def _relative_dates() -> tuple[str, str]:
+    """Today's and tomorrow's dates as YYYY-MM-DD, formatted once per day"""
+    global _relative_dates_cache
+    today = datetime.now().date()
+    if _relative_dates_cache[0] != today:
+        _relative_dates_cache = (today, today.isoformat(), (today + _ONE_DAY).isoformat())
+    return _relative_dates_cache[1], _relative_dates_cache[2]
+
+
+@functools.lru_cache(maxsize=2048)
+def _parse_flight_text(text: str) -> Optional[tuple[str, str, str]]:
     """
-    Extract airline, flight number, and date from text
+    Extract airline, flight number, and date spec from text, cached by text
     
-    Returns:
-        Tuple of (airline, flight_number, date) or None
+    The date spec is an explicit YYYY-MM-DD date or "TODAY"/"TOMORROW". Relative
+    dates are resolved by parse_flight_input, so a cached parse never goes stale.
     """
     text_upper = text.upper()
     
     # Try to extract flight number (airline code + number)
-    flight_pattern = r'\b([A-Z]{2})\s?(\d{1,4})\b'
-    match = re.search(flight_pattern, text_upper)
+    match = _FLIGHT_PATTERN.search(text_upper)
     
     if not match:
         return None
@@ -551,259 +636,253 @@ def parse_flight_input(text: str) -> Optional[tuple[str, str, str]]:
     flight_number = match.group(2)
     
     # Try to extract date
-    date = None
-    date_patterns = [
-        r'(\d{4}-\d{2}-\d{2})',  # YYYY-MM-DD
-        r'(\d{2}/\d{2}/\d{4})',  # MM/DD/YYYY
-        r'(TODAY|TOMORROW)',
-    ]
-    
-    for pattern in date_patterns:
-        date_match = re.search(pattern, text_upper)
-        if date_match:
-            date_str = date_match.group(1)
-            if date_str == 'TODAY':
-                date = datetime.now().strftime('%Y-%m-%d')
-            elif date_str == 'TOMORROW':
-                date = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
-            elif '/' in date_str:
-                # Convert MM/DD/YYYY to YYYY-MM-DD
-                parts = date_str.split('/')
-                date = f"{parts[2]}-{parts[0].zfill(2)}-{parts[1].zfill(2)}"
-            else:
-                date = date_str
-            break
+    date_match = _DATE_PATTERN.search(text_upper)
+    if date_match:
+        if date_match.lastgroup == 'iso':
+            return airline, flight_number, date_match.group('iso')
+        # Convert MM/DD/YYYY to YYYY-MM-DD
+        return airline, flight_number, f"{date_match.group('us_year')}-{date_match.group('us_month')}-{date_match.group('us_day')}"
     
     # Default to tomorrow if no date specified
-    if not date:
-        date = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
-    
-    return airline, flight_number, date
+    relative_match = _RELATIVE_DATE_PATTERN.search(text_upper)
+    return airline, flight_number, relative_match.group() if relative_match else 'TOMORROW'
 
 
-def format_recommendation_as_text(analysis: dict, airline: str, flight_number: str, date: str, flight_data: FlightHistoricalResponse = None, weather_data: dict = None) -> str:
-    """Format recommendation as readable text with all insurance options"""
+# Index into _relative_dates() for each relative date spec
+_RELATIVE_DAY_INDEX = {'TODAY': 0, 'TOMORROW': 1}
+
+
+def parse_flight_input(text: str) -> Optional[tuple[str, str, str]]:
+    """
+    Extract airline, flight number, and date from text
     
-    # Insurance type emoji
-    insurance_emoji = {
-        "delay_1h": "💎",
-        "delay_2h": "🥇",
-        "delay_3h": "🥈",
-        "delay_4h": "🥉",
-        "delay": "⏱️"
-    }
+    Returns:
+        Tuple of (airline, flight_number, date) or None
+    """
+    if len(text) < _MIN_FLIGHT_TEXT:
+        return None
     
-    emoji = insurance_emoji.get(analysis['recommendation'], "🛡️")
+    parsed = _parse_flight_text(text)
+    if parsed is None:
+        return None
     
-    response = f"""{emoji} **Insurance Recommendation for Flight {airline}{flight_number}**
-
-"""
+    airline, flight_number, date = parsed
+    day = _RELATIVE_DAY_INDEX.get(date)
+    if day is not None:
+        date = _relative_dates()[day]
     
-    # Add flight details if available
-    if flight_data and flight_data.success:
-        response += f"""**Flight Details:**
-✈️ {airline}{flight_number} | {analysis.get('route', 'N/A')}
-📍 {flight_data.origin_city or 'Unknown'} → {flight_data.destination_city or 'Unknown'}
+    return airline, flight_number, date
+
+
+# Emoji lookups for the chat recommendation text
+_INSURANCE_EMOJI = {
+    "delay_1h": "💎",
+    "delay_2h": "🥇",
+    "delay_3h": "🥈",
+    "delay_4h": "🥉",
+    "delay": "⏱️"
+}
+
+_WEATHER_EMOJI = {
+    'clear': '☀️',
+    'clouds': '☁️',
+    'rain': '🌧️',
+    'snow': '❄️',
+    'thunderstorm': '⛈️',
+    'fog': '🌫️',
+    'mist': '🌫️'
+}
+
+_RISK_EMOJI = {
+    'LOW': '✅',
+    'MODERATE': '⚠️',
+    'HIGH': '🔴',
+    'SEVERE': '🚨'
+}
+
+
+# Static blocks of the chat recommendation text
+_SEPARATOR = "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
+
+_OPTIONS_HEADER = f"\n\n{_SEPARATOR}\n**📋 AVAILABLE INSURANCE OPTIONS**\n{_SEPARATOR}\n\n"
+
+_FOOTER = (
+    f"{_SEPARATOR}\n\n"
+    "🌐 **[Visit travelsure.vercel.app to purchase insurance](https://travelsure.vercel.app)**\n\n"
+    "⚡ Smart contract powered • Instant payouts • No paperwork\n\n"
+    "💎 **Bonus: Stake & Earn!**\n\n"
+    "Stake your funds on TravelSure to:\n\n"
+    "• Earn competitive yields on your staked amount\n\n"
+    "• Get FREE cancellation insurance automatically\n\n"
+    "• Support the insurance pool and earn rewards\n\n"
+    "💡 *All recommendations based on real-time data and historical flight performance*"
+)
+
+_HEADER_TEMPLATE = "{emoji} **Insurance Recommendation for Flight {airline}{flight_number}**\n\n"
+
+_FLIGHT_DETAILS_TEMPLATE = """**Flight Details:**
+✈️ {airline}{flight_number} | {route}
+📍 {origin} → {destination}
 📅 {date}
-🕐 Departure: {flight_data.departure_time[:16] if flight_data.departure_time else 'N/A'}
+🕐 Departure: {departure}
 
 **Performance Metrics:**
-📊 On-time Rate: {flight_data.ontime_percent*100:.1f}% ({flight_data.ontime_count}/{flight_data.total_historical_flights} flights)
-⚠️ Risk Level: {analysis.get('risk_level', 'MEDIUM')}
-📈 Historical Delays: {flight_data.delayed_count}
-❌ Cancellations: {flight_data.cancelled_count}
+📊 On-time Rate: {ontime_rate:.1f}% ({ontime_count}/{total_flights} flights)
+⚠️ Risk Level: {risk_level}
+📈 Historical Delays: {delayed_count}
+❌ Cancellations: {cancelled_count}
 
 """
+
+_WEATHER_PENDING = "🌤️ Weather data: Real-time conditions being checked...\n📡 Weather Agent integration active\n"
+
+
+def _fmt_temp(temp: float) -> str:
+    """Temperature line for the weather section"""
+    # temp * 9 / 5 keeps the multiply exact; folding it into 1.8 shifts the rounding of some readings
+    return f"🌡️ Temperature: {temp:.1f}°C ({temp * 9 / 5 + 32:.1f}°F)\n"
+
+
+def _render_weather(parts: list[str], weather_data: Optional[dict]) -> None:
+    """
+    Append the weather section of the chat recommendation
     
-    # Add weather information
-    response += "**Weather Conditions:**\n"
-    if weather_data and weather_data.get('success'):
-        weather_emoji = {
-            'clear': '☀️',
-            'clouds': '☁️',
-            'rain': '🌧️',
-            'snow': '❄️',
-            'thunderstorm': '⛈️',
-            'fog': '🌫️',
-            'mist': '🌫️'
-        }
-        
-        condition = weather_data.get('condition', 'unknown')
-        w_emoji = weather_emoji.get(condition.lower(), '🌤️')
-        temp = weather_data.get('temperature')
+    Args:
+        parts: Response fragments being built by format_recommendation_as_text
+        weather_data: Stored weather data - complete, partial (success=False) or None
+    """
+    append = parts.append
+    append("**Weather Conditions:**\n")
+    
+    if not weather_data:
+        # No weather data object at all
+        append(_WEATHER_PENDING)
+        return
+    
+    condition = weather_data.get('condition')
+    temp = weather_data.get('temperature')
+    w_emoji = _WEATHER_EMOJI.get(condition.lower(), '🌤️') if condition else '🌤️'
+    
+    if weather_data.get('success'):
         delay_risk = weather_data.get('delay_risk', 'UNKNOWN')
-        description = weather_data.get('description', 'N/A')
+        description = weather_data.get('description')
         
-        # Risk level emoji
-        risk_emoji = {
-            'LOW': '✅',
-            'MODERATE': '⚠️',
-            'HIGH': '🔴',
-            'SEVERE': '🚨'
-        }
-        r_emoji = risk_emoji.get(delay_risk, '❓')
-        
-        response += f"""{w_emoji} Current: {description.title() if description else 'N/A'}
-"""
+        append(f"{w_emoji} Current: {description.title() if description else 'N/A'}\n")
         if temp is not None:
-            response += f"""🌡️ Temperature: {temp:.1f}°C ({temp * 9/5 + 32:.1f}°F)
-"""
-        response += f"""{r_emoji} Weather Delay Risk: {delay_risk}
-"""
+            append(_fmt_temp(temp))
+        append(f"{_RISK_EMOJI.get(delay_risk, '❓')} Weather Delay Risk: {delay_risk}\n")
         
         if weather_data.get('risk_reasoning'):
-            response += f"""💡 {weather_data['risk_reasoning']}
-"""
-    else:
-        # Show whatever weather data we have, even if not fully successful
-        if weather_data:
-            condition = weather_data.get('condition')
-            temp = weather_data.get('temperature')
-            delay_risk = weather_data.get('delay_risk')
-            
-            if condition or temp or delay_risk:
-                # We have partial data, show it
-                response += "🌤️ **Weather Status:**\n"
-                
-                if condition:
-                    weather_emoji_fallback = {
-                        'clear': '☀️',
-                        'clouds': '☁️',
-                        'rain': '🌧️',
-                        'snow': '❄️',
-                        'thunderstorm': '⛈️',
-                        'fog': '🌫️',
-                        'mist': '🌫️'
-                    }
-                    w_emoji = weather_emoji_fallback.get(condition.lower(), '🌤️')
-                    response += f"{w_emoji} Condition: {condition.title()}\n"
-                
-                if temp is not None:
-                    response += f"🌡️ Temperature: {temp:.1f}°C ({temp * 9/5 + 32:.1f}°F)\n"
-                
-                if delay_risk:
-                    risk_emoji_fallback = {'LOW': '✅', 'MODERATE': '⚠️', 'HIGH': '🔴', 'SEVERE': '🚨'}
-                    r_emoji = risk_emoji_fallback.get(delay_risk, '❓')
-                    response += f"{r_emoji} Weather Delay Risk: {delay_risk}\n"
-            else:
-                # No usable data at all
-                response += "🌤️ Weather data: Real-time conditions being checked...\n"
-                response += "📡 Weather Agent integration active\n"
-        else:
-            # No weather data object at all
-            response += "🌤️ Weather data: Real-time conditions being checked...\n"
-            response += "📡 Weather Agent integration active\n"
+            append(f"💡 {weather_data['risk_reasoning']}\n")
+        return
+    
+    # Show whatever weather data we have, even if not fully successful
+    delay_risk = weather_data.get('delay_risk')
+    if not (condition or temp or delay_risk):
+        # No usable data at all
+        append(_WEATHER_PENDING)
+        return
+    
+    append("🌤️ **Weather Status:**\n")
+    if condition:
+        append(f"{w_emoji} Condition: {condition.title()}\n")
+    if temp is not None:
+        append(_fmt_temp(temp))
+    if delay_risk:
+        append(f"{_RISK_EMOJI.get(delay_risk, '❓')} Weather Delay Risk: {delay_risk}\n")
+
+
+def format_recommendation_as_text(analysis: dict, airline: str, flight_number: str, date: str, flight_data: FlightHistoricalResponse = None, weather_data: dict = None) -> str:
+    """Format recommendation as readable text with all insurance options"""
+    
+    emoji = _INSURANCE_EMOJI.get(analysis['recommendation'], "🛡️")
+    
+    parts = [_HEADER_TEMPLATE.format(emoji=emoji, airline=airline, flight_number=flight_number)]
+    append = parts.append
+    
+    # Add flight details if available
+    if flight_data and flight_data.success:
+        append(_FLIGHT_DETAILS_TEMPLATE.format(
+            airline=airline,
+            flight_number=flight_number,
+            route=analysis.get('route', 'N/A'),
+            origin=flight_data.origin_city or 'Unknown',
+            destination=flight_data.destination_city or 'Unknown',
+            date=date,
+            departure=flight_data.departure_time[:16] if flight_data.departure_time else 'N/A',
+            ontime_rate=flight_data.ontime_percent * 100,
+            ontime_count=flight_data.ontime_count,
+            total_flights=flight_data.total_historical_flights,
+            risk_level=analysis.get('risk_level', 'MEDIUM'),
+            delayed_count=flight_data.delayed_count,
+            cancelled_count=flight_data.cancelled_count,
+        ))
+    
+    # Add weather information
+    _render_weather(parts, weather_data)
     
-    response += "\n"
+    append("\n")
     
-    response += f"""**Our Recommendation:** {analysis['recommendation'].replace('_', ' ').title()}
+    append(f"""**Our Recommendation:** {analysis['recommendation'].replace('_', ' ').title()}
 **Confidence:** {analysis['confidence'] * 100:.0f}%
 
-"""
+""")
     
     # Format the reasoning - split by newlines and display each point
     reasoning_text = analysis['reasoning']
     if '🔍' in reasoning_text:
         # MeTTa provided detailed multi-factor reasoning - show it beautifully
-        response += "**🧠 AI Multi-Factor Analysis:**\n"
-        reasoning_lines = reasoning_text.split('\n')
-        for line in reasoning_lines:
-            line = line.strip()
-            if line:
-                # Each line is already formatted with emoji from MeTTa
-                response += f"{line}\n"
+        append("**🧠 AI Multi-Factor Analysis:**\n")
+        # Each line is already formatted with emoji from MeTTa; drop the blank
+        # separator lines and emit the rest as one block
+        reasoning_lines = [line for line in map(str.strip, reasoning_text.splitlines()) if line]
+        append("\n".join(reasoning_lines))
+        append("\n")
         
         # Add final recommendation summary
-        response += "\n**💡 Final Recommendation:**\n\n"
-        response += f"Based on comprehensive AI analysis of {analysis.get('risk_factors', []).__len__()} risk factors, we recommend **{analysis['recommendation'].replace('_', '-').upper()}** insurance coverage with **{analysis['confidence'] * 100:.0f}%** confidence.**\n"
+        append("\n**💡 Final Recommendation:**\n\n")
+        rf_count = len(analysis.get('risk_factors') or ())
+        append(f"Based on comprehensive AI analysis of {rf_count} risk factors, we recommend **{analysis['recommendation'].replace('_', '-').upper()}** insurance coverage with **{analysis['confidence'] * 100:.0f}%** confidence.**\n")
     else:
         # Simple reasoning without multi-factor breakdown
-        response += "**📊 Analysis:**\n"
-        response += f"{reasoning_text}\n"
+        append("**📊 Analysis:**\n")
+        append(f"{reasoning_text}\n")
     
-    response += "\n**⚠️ Identified Risk Factors:**\n"
+    append("\n**⚠️ Identified Risk Factors:**\n")
     for factor in analysis['risk_factors']:
-        response += f"• {factor}\n"
+        append(f"• {factor}\n")
     
     # Display all insurance options
-    response += "\n\n━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
-    response += "**📋 AVAILABLE INSURANCE OPTIONS**\n"
-    response += "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+    append(_OPTIONS_HEADER)
     
     insurance_options = analysis.get('insurance_options', [])
-    
-    # Update emoji map for new options
-    insurance_emoji_extended = {
-        "delay_1h": "💎",
-        "delay_2h": "🥇",
-        "delay_3h": "🥈",
-        "delay_4h": "🥉",
-        "delay": "⏱️"
-    }
+    recommended_type = analysis['recommendation']
     
     for idx, option in enumerate(insurance_options, 1):
-        option_emoji = insurance_emoji_extended.get(option['option_type'], "📄")
-        is_recommended = option.get('recommended', False) or option['option_type'] == analysis['recommendation']
+        option_type = option['option_type']
+        option_emoji = _INSURANCE_EMOJI.get(option_type, "📄")
+        is_recommended = option.get('recommended', False) or option_type == recommended_type
         
         # Add star for recommended option
         rec_marker = " ⭐ **RECOMMENDED**" if is_recommended else ""
         
-        response += f"""**{idx}. {option_emoji} {option['name']}**{rec_marker}
+        append(f"""**{idx}. {option_emoji} {option['name']}**{rec_marker}
 💵 Premium: **${option['premium']:.2f}**
 
 {option['description']}
-"""
-        response += "\n"
+
+""")
     
-    response += "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-    response += "🌐 **[Visit travelsure.vercel.app to purchase insurance](https://travelsure.vercel.app)**\n\n"
-    response += "⚡ Smart contract powered • Instant payouts • No paperwork\n\n"
-    response += "💎 **Bonus: Stake & Earn!**\n\n"
-    response += "Stake your funds on TravelSure to:\n\n"
-    response += "• Earn competitive yields on your staked amount\n\n"
-    response += "• Get FREE cancellation insurance automatically\n\n"
-    response += "• Support the insurance pool and earn rewards\n\n"
-    response += "💡 *All recommendations based on real-time data and historical flight performance*"
+    append(_FOOTER)
     
-    return response
+    return "".join(parts)
 
 
 # ========================================
-# CHAT PROTOCOL HANDLERS
+# CHAT RESPONSES
 # ========================================
 
-if CHAT_PROTOCOL_AVAILABLE and chat_protocol:
-    @chat_protocol.on_message(ChatMessage)
-    async def handle_chat_message(ctx: Context, sender: str, msg: ChatMessage):
-        """Handle incoming chat messages from Agentverse"""
-        try:
-            # Extract text content
-            text_content = None
-            for content in msg.content:
-                if hasattr(content, 'text'):
-                    text_content = content.text
-                    break
-            
-            if not text_content:
-                ctx.logger.warning("Received chat message without text content")
-                return
-            
-            ctx.logger.info(f"Chat from {sender}: {text_content}")
-            
-            # Send acknowledgement
-            await ctx.send(
-                sender,
-                ChatAcknowledgement(
-                    timestamp=datetime.now(),
-                    acknowledged_msg_id=msg.msg_id
-                )
-            )
-            
-            text_lower = text_content.lower()
-            
-            # Handle greetings
-            if any(word in text_lower for word in ['hello', 'hi', 'hey', 'greetings']):
-                response_text = """👋 Hello! I'm your TravelSure Insurance Advisor.
+GREETING_TEXT = """👋 Hello! I'm your TravelSure Insurance Advisor.
 
 I analyze flights using real-time data, historical performance, and AI-powered knowledge graphs to recommend the best insurance coverage!
 
@@ -832,20 +911,8 @@ Tell me your flight number and date:
 🌐 Purchase at: travelsure.vercel.app
 
 What flight would you like me to analyze?"""
-                
-                await ctx.send(
-                    sender,
-                    ChatMessage(
-                        timestamp=datetime.now(),
-                        msg_id=uuid4(),
-                        content=[TextContent(type="text", text=response_text)]
-                    )
-                )
-                return
-            
-            # Handle help requests
-            if 'help' in text_lower:
-                response_text = """📋 **TravelSure Insurance Advisor - Help**
+
+HELP_TEXT = """📋 **TravelSure Insurance Advisor - Help**
 
 **How It Works:**
 1. **Tell me your flight** - Include airline code + number and optional date
@@ -891,15 +958,160 @@ What flight would you like me to analyze?"""
 "I need insurance for flight AA100 on 2025-10-25"
 
 Ready to analyze your flight with multi-factor AI reasoning!"""
-                
-                await ctx.send(
-                    sender,
-                    ChatMessage(
-                        timestamp=datetime.now(),
-                        msg_id=uuid4(),
-                        content=[TextContent(type="text", text=response_text)]
-                    )
+
+NO_FLIGHT_TEXT = """❌ I couldn't find a valid flight number in your message.
+
+**Please provide:**
+• Airline code (2 letters): AA, UA, BA, DL, etc.
+• Flight number: 100, 890, 001, etc.
+• Date (optional): 2025-10-20, tomorrow, today
+
+**Examples:**
+• "Check flight AA100 on 2025-10-20"
+• "I have UA890 tomorrow"
+• "Analyze BA001"
+
+Type 'help' for more information."""
+
+CHAT_ERROR_TEXT = "Sorry, I encountered an error. Please try again."
+
+
+# Random bytes for outgoing message ids, drawn from os.urandom 256 ids at a time
+# rather than with one urandom call per uuid4()
+_MSG_ID_BATCH = 256
+_msg_id_pool: list[UUID] = []
+
+
+def _next_msg_id() -> UUID:
+    """Return a fresh random (version 4) UUID from the pre-generated pool"""
+    if not _msg_id_pool:
+        raw = os.urandom(16 * _MSG_ID_BATCH)
+        _msg_id_pool.extend(UUID(bytes=raw[i:i + 16], version=4) for i in range(0, len(raw), 16))
+    return _msg_id_pool.pop()
+
+
+async def _send_content(ctx: Context, destination: str, content: list) -> None:
+    """Send a ChatMessage carrying content to a chat peer"""
+    await ctx.send(
+        destination,
+        ChatMessage(
+            timestamp=datetime.now(),
+            msg_id=_next_msg_id(),
+            content=content
+        )
+    )
+
+
+async def _send_text(ctx: Context, destination: str, text: str) -> None:
+    """Send text to a chat peer as a single-content ChatMessage"""
+    await _send_content(ctx, destination, [TextContent(type="text", text=text)])
+
+
+async def _send_text_to_all(ctx: Context, destinations: list[str], text: str) -> None:
+    """Send the same text to several chat peers concurrently, logging failed sends instead of raising"""
+    results = await asyncio.gather(
+        *(_send_text(ctx, destination, text) for destination in destinations),
+        return_exceptions=True
+    )
+    for destination, result in zip(destinations, results):
+        if isinstance(result, Exception):
+            ctx.logger.warning("⚠️ Chat message to %s failed: %s", destination, result)
+
+
+# Sends started by _send_text_in_background; the event loop only keeps weak
+# references to tasks, so they are held here until they finish
+_background_sends: set[asyncio.Task] = set()
+
+
+def _send_text_in_background(ctx: Context, destination: str, text: str) -> None:
+    """Send text to a chat peer without waiting for delivery, logging a failed send"""
+    task = asyncio.create_task(_send_text(ctx, destination, text))
+    _background_sends.add(task)
+    
+    def _done(task: asyncio.Task) -> None:
+        _background_sends.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            ctx.logger.error("Background chat send to %s failed: %s", destination, task.exception())
+    
+    task.add_done_callback(_done)
+
+
+# Seconds a chat session keeps collecting senders for the same flight before a
+# new chat re-requests the data (the Historical Agent may never have answered)
+IN_FLIGHT_TIMEOUT = 60.0
+
+if CHAT_PROTOCOL_AVAILABLE:
+    # Content for the constant replies, validated once here instead of per send
+    # (ChatMessage copies the list, so the shared instances are never mutated)
+    GREETING_CONTENT = [TextContent(type="text", text=GREETING_TEXT)]
+    HELP_CONTENT = [TextContent(type="text", text=HELP_TEXT)]
+    NO_FLIGHT_CONTENT = [TextContent(type="text", text=NO_FLIGHT_TEXT)]
+    CHAT_ERROR_CONTENT = [TextContent(type="text", text=CHAT_ERROR_TEXT)]
+
+
+# ========================================
+# CHAT PROTOCOL HANDLERS
+# ========================================
+
+# Intent keywords, matched case-insensitively as whole words in one scan of the message
+_INTENT_PATTERN = re.compile(r'\b(hello|hi|hey|greetings|help)\b', re.IGNORECASE)
+_INTENT_BY_KEYWORD = {
+    'hello': 'greeting',
+    'hi': 'greeting',
+    'hey': 'greeting',
+    'greetings': 'greeting',
+    'help': 'help',
+}
+
+
+def _detect_intent(text: str) -> Optional[str]:
+    """Chat intent ("greeting" or "help") named in text; a greeting anywhere takes precedence"""
+    intent = None
+    for match in _INTENT_PATTERN.finditer(text):
+        # Only the short matched keyword is lower-cased, never the whole message
+        intent = _INTENT_BY_KEYWORD[match.group(1).lower()]
+        if intent == 'greeting':
+            break
+    return intent
+
+
+if CHAT_PROTOCOL_AVAILABLE and chat_protocol:
+    @chat_protocol.on_message(ChatMessage)
+    async def handle_chat_message(ctx: Context, sender: str, msg: ChatMessage):
+        """Handle incoming chat messages from Agentverse"""
+        try:
+            # Extract text content
+            text_content = None
+            for content in msg.content:
+                if hasattr(content, 'text'):
+                    text_content = content.text
+                    break
+            
+            if not text_content:
+                ctx.logger.warning("Received chat message without text content")
+                return
+            
+            ctx.logger.info("Chat from %s: %s", sender, text_content)
+            
+            # Send acknowledgement
+            await ctx.send(
+                sender,
+                ChatAcknowledgement(
+                    timestamp=datetime.now(),
+                    acknowledged_msg_id=msg.msg_id
                 )
+            )
+            
+            intent = _detect_intent(text_content)
+            
+            # Handle greetings
+            if intent == 'greeting':
+                await _send_content(ctx, sender, GREETING_CONTENT)
+                return
+            
+            # Handle help requests
+            if intent == 'help':
+                await _send_content(ctx, sender, HELP_CONTENT)
                 return
             
             # Try to parse flight information
@@ -909,11 +1121,29 @@ Ready to analyze your flight with multi-factor AI reasoning!"""
                 airline, flight_number, date = flight_info
                 full_flight_id = f"{airline}{flight_number}-{date}"
                 
-                # Store sender for later response
-                ctx.storage.set(f"chat_sender_{full_flight_id}", sender)
-                ctx.storage.set(f"chat_airline_{full_flight_id}", airline)
-                ctx.storage.set(f"chat_flight_{full_flight_id}", flight_number)
-                ctx.storage.set(f"chat_date_{full_flight_id}", date)
+                cached = _recommendation_cache.get((airline, flight_number, date))
+                if cached is not None:
+                    flight_data, weather_data, analysis = cached
+                    ctx.logger.info("Using cached recommendation for %s", full_flight_id)
+                    response_text = format_recommendation_as_text(analysis, airline, flight_number, date, flight_data, weather_data)
+                    await _send_text(ctx, sender, response_text)
+                    return
+                
+                # Join an analysis of the same flight that is already in flight
+                chat_session = _chat_sessions.get(full_flight_id)
+                in_flight = chat_session is not None and time.monotonic() - chat_session["requested_at"] < IN_FLIGHT_TIMEOUT
+                if in_flight:
+                    if sender not in chat_session["senders"]:
+                        chat_session["senders"].append(sender)
+                else:
+                    # Store the chat session (senders and parsed flight) for the later response
+                    _chat_sessions.set(full_flight_id, {
+                        "senders": [sender],
+                        "airline": airline,
+                        "flight_number": flight_number,
+                        "date": date,
+                        "requested_at": time.monotonic(),
+                    })
                 
                 # Send processing message
                 processing_text = f"""🔍 Analyzing flight {airline}{flight_number} on {date}...
@@ -928,17 +1158,15 @@ Ready to analyze your flight with multi-factor AI reasoning!"""
 • 📅 Seasonal risk factors
 
 Please wait..."""
-                await ctx.send(
-                    sender,
-                    ChatMessage(
-                        timestamp=datetime.now(),
-                        msg_id=uuid4(),
-                        content=[TextContent(type="text", text=processing_text)]
-                    )
-                )
+                # A progress notice only, so it goes out alongside the historical request
+                _send_text_in_background(ctx, sender, processing_text)
+                
+                if in_flight:
+                    ctx.logger.info("Analysis for %s already in flight, %s will get its reply", full_flight_id, sender)
+                    return
                 
                 # Request comprehensive flight analysis
-                ctx.logger.info(f"Requesting historical data for {airline}{flight_number} on {date}")
+                ctx.logger.info("Requesting historical data for %s%s on %s", airline, flight_number, date)
                 await ctx.send(
                     FLIGHT_HISTORICAL_AGENT,
                     FlightHistoricalRequest(
@@ -949,46 +1177,17 @@ Please wait..."""
                 )
             else:
                 # No flight number found
-                response_text = """❌ I couldn't find a valid flight number in your message.
-
-**Please provide:**
-• Airline code (2 letters): AA, UA, BA, DL, etc.
-• Flight number: 100, 890, 001, etc.
-• Date (optional): 2025-10-20, tomorrow, today
-
-**Examples:**
-• "Check flight AA100 on 2025-10-20"
-• "I have UA890 tomorrow"
-• "Analyze BA001"
-
-Type 'help' for more information."""
-                
-                await ctx.send(
-                    sender,
-                    ChatMessage(
-                        timestamp=datetime.now(),
-                        msg_id=uuid4(),
-                        content=[TextContent(type="text", text=response_text)]
-                    )
-                )
+                await _send_content(ctx, sender, NO_FLIGHT_CONTENT)
                 
         except Exception as e:
-            ctx.logger.error(f"Error in chat handler: {e}")
-            error_text = "Sorry, I encountered an error. Please try again."
-            await ctx.send(
-                sender,
-                ChatMessage(
-                    timestamp=datetime.now(),
-                    msg_id=uuid4(),
-                    content=[TextContent(type="text", text=error_text)]
-                )
-            )
+            ctx.logger.error("Error in chat handler: %s", e)
+            await _send_content(ctx, sender, CHAT_ERROR_CONTENT)
 
 
     @chat_protocol.on_message(ChatAcknowledgement)
     async def handle_chat_ack(ctx: Context, sender: str, msg: ChatAcknowledgement):
         """Handle chat acknowledgements"""
-        ctx.logger.info(f"Received ack from {sender} for {msg.acknowledged_msg_id}")
+        ctx.logger.info("Received ack from %s for %s", sender, msg.acknowledged_msg_id)
 
 # ========================================
 # DIRECT AGENT MESSAGE HANDLERS (for inter-agent communication)
@@ -1001,197 +1200,194 @@ Type 'help' for more information."""
 @insurance_agent.on_message(model=WeatherResponse)
 async def handle_weather_data(ctx: Context, sender: str, msg: WeatherResponse):
     """Handle weather data from Weather Agent"""
-    ctx.logger.info(f"[WEATHER] Received weather data for: {msg.airport_code}")
+    ctx.logger.info("[WEATHER] Received weather data for: %s", msg.airport_code)
     
     try:
         # Store weather data temporarily
-        ctx.storage.set(f"weather_{msg.airport_code}", {
+        weather = {
             "success": msg.success,
             "condition": msg.condition,
             "temperature": msg.temperature,
             "delay_risk": msg.delay_risk,
             "risk_reasoning": msg.risk_reasoning,
             "description": msg.description
-        })
+        }
+        ctx.storage.set(f"weather_{msg.airport_code}", weather)
+        
+        # Wake up any analysis waiting on this airport
+        future = _pending_weather.pop(msg.airport_code, None)
+        if future is not None and not future.done():
+            future.set_result(weather)
         
         if msg.success:
-            ctx.logger.info(f"✅ Weather: {msg.condition}, Risk: {msg.delay_risk}")
+            ctx.logger.info("✅ Weather: %s, Risk: %s", msg.condition, msg.delay_risk)
         else:
-            ctx.logger.warning(f"⚠️ Weather fetch error: {msg.error}")
+            ctx.logger.warning("⚠️ Weather fetch error: %s", msg.error)
             
     except Exception as e:
-        ctx.logger.error(f"Error processing weather data: {e}")
+        ctx.logger.error("Error processing weather data: %s", e)
 
 
 # ========================================
 # FLIGHT HISTORICAL AGENT RESPONSE HANDLER
 # ========================================
 
+async def _fetch_weather(ctx: Context, role: str, airport_code: Optional[str], city: Optional[str]) -> Optional[dict]:
+    """
+    Request weather for one airport of a route and wait for the answer
+    
+    Args:
+        ctx: Agent context
+        role: "origin" or "destination", for logging
+        airport_code: IATA airport code, if the route has one
+        city: City name passed along to the Weather Agent
+        
+    Returns:
+        The fresh weather, the last stored weather if the Weather Agent didn't
+        answer within WEATHER_TIMEOUT, or None without an airport code
+    """
+    if not airport_code:
+        return None
+    
+    ctx.logger.info("Requesting weather for %s: %s", role, airport_code)
+    future = _expect_weather(airport_code)
+    await ctx.send(WEATHER_AGENT, WeatherRequest(airport_code=airport_code, city=city))
+    
+    # asyncio.wait leaves the shared future alone on timeout, unlike wait_for
+    done, _ = await asyncio.wait((future,), timeout=WEATHER_TIMEOUT)
+    if not done:
+        ctx.logger.warning("⚠️ Weather Agent did not answer for %s within %.0fs", airport_code, WEATHER_TIMEOUT)
+    return _weather_result(ctx, airport_code, future)
+
+
+def build_insurance_recommendation(flight_data: FlightHistoricalResponse, analysis: dict) -> InsuranceRecommendation:
+    """
+    Build the protocol reply for an analyzed flight
+    
+    Args:
+        flight_data: Flight data the analysis was run on
+        analysis: Result of analyze_comprehensive_risk
+        
+    Returns:
+        InsuranceRecommendation with one InsuranceOption per analyzed option
+    """
+    # Option mappings carry exactly the InsuranceOption fields, recommended included
+    insurance_options_objects = [InsuranceOption(**opt) for opt in analysis.get('insurance_options', ())]
+    
+    return InsuranceRecommendation(
+        flight_number=f"{flight_data.airline}{flight_data.flight_number}",
+        recommended_insurance=analysis['recommendation'],
+        confidence_score=analysis['confidence'],
+        reasoning=analysis['reasoning'],
+        risk_factors=analysis['risk_factors'],
+        estimated_premium=analysis['estimated_premium'],
+        route_info=analysis.get('route'),
+        risk_level=analysis.get('risk_level'),
+        insurance_options=insurance_options_objects
+    )
+
+
 @insurance_agent.on_message(model=FlightHistoricalResponse)
 async def handle_flight_historical_data(ctx: Context, sender: str, msg: FlightHistoricalResponse):
     """Handle comprehensive flight data from Flight Historical Agent"""
-    ctx.logger.info(f"[HANDLER] Received historical data for: {msg.airline}{msg.flight_number} on {msg.date}")
+    ctx.logger.info("[HANDLER] Received historical data for: %s%s on %s", msg.airline, msg.flight_number, msg.date)
     
     try:
         full_flight_id = f"{msg.airline}{msg.flight_number}-{msg.date}"
         
         if not msg.success:
             # Handle error from Historical Agent
-            ctx.logger.error(f"Historical Agent error: {msg.error}")
+            ctx.logger.error("Historical Agent error: %s", msg.error)
             
-            chat_sender = ctx.storage.get(f"chat_sender_{full_flight_id}")
-            if chat_sender:
+            chat_session = _chat_sessions.get(full_flight_id)
+            if chat_session:
                 error_text = f"❌ Unable to analyze flight {msg.airline}{msg.flight_number}:\n\n{msg.error}\n\nPlease verify the flight number and date, then try again."
-                await ctx.send(
-                    chat_sender,
-                    ChatMessage(
-                        timestamp=datetime.now(),
-                        msg_id=uuid4(),
-                        content=[TextContent(type="text", text=error_text)]
-                    )
-                )
-                ctx.storage.set(f"chat_sender_{full_flight_id}", None)
+                await _send_text_to_all(ctx, chat_session["senders"], error_text)
+                _chat_sessions.discard(full_flight_id)
             return
         
         # ========================================
         # REQUEST WEATHER DATA FOR BOTH AIRPORTS
         # ========================================
-        weather_data_origin = None
-        weather_data_dest = None
-        
-        if msg.origin_iata:
-            ctx.logger.info(f"Requesting weather for origin: {msg.origin_iata}")
-            await ctx.send(
-                WEATHER_AGENT,
-                WeatherRequest(
-                    airport_code=msg.origin_iata,
-                    city=msg.origin_city
-                )
-            )
-            # Wait a bit for weather response
-            await asyncio.sleep(2)
-            weather_data_origin = ctx.storage.get(f"weather_{msg.origin_iata}")
-        
-        if msg.destination_iata:
-            ctx.logger.info(f"Requesting weather for destination: {msg.destination_iata}")
-            await ctx.send(
-                WEATHER_AGENT,
-                WeatherRequest(
-                    airport_code=msg.destination_iata,
-                    city=msg.destination_city
-                )
-            )
-            # Wait a bit for weather response
-            await asyncio.sleep(2)
-            weather_data_dest = ctx.storage.get(f"weather_{msg.destination_iata}")
+        # Request both airports at once; each resumes as soon as its weather
+        # arrives (or WEATHER_TIMEOUT passes) instead of sleeping a fixed interval
+        weather_data_origin, weather_data_dest = await asyncio.gather(
+            _fetch_weather(ctx, "origin", msg.origin_iata, msg.origin_city),
+            _fetch_weather(ctx, "destination", msg.destination_iata, msg.destination_city),
+        )
         
         # Use worst-case weather data for analysis
         weather_data = weather_data_dest if weather_data_dest else weather_data_origin
         
         # Log weather data status
         if weather_data:
-            ctx.logger.info(f"✅ Weather data retrieved: {weather_data.get('condition')} at destination/origin")
-            ctx.logger.info(f"   Weather delay risk: {weather_data.get('delay_risk')}")
+            ctx.logger.info("✅ Weather data retrieved: %s at destination/origin", weather_data.get('condition'))
+            ctx.logger.info("   Weather delay risk: %s", weather_data.get('delay_risk'))
             if weather_data.get('temperature'):
-                ctx.logger.info(f"   Temperature: {weather_data.get('temperature'):.1f}°C")
+                ctx.logger.info("   Temperature: %.1f°C", weather_data.get('temperature'))
         else:
-            ctx.logger.warning(f"⚠️ No weather data available for route")
+            ctx.logger.warning("⚠️ No weather data available for route")
         
         # Analyze the comprehensive data with weather
-        ctx.logger.info(f"Analyzing comprehensive data: Risk={msg.delay_risk}, On-time={msg.ontime_percent}")
+        ctx.logger.info("Analyzing comprehensive data: Risk=%s, On-time=%s", msg.delay_risk, msg.ontime_percent)
         if weather_data:
-            ctx.logger.info(f"Weather considered: {weather_data.get('condition')} ({weather_data.get('delay_risk')})")
+            ctx.logger.info("Weather considered: %s (%s)", weather_data.get('condition'), weather_data.get('delay_risk'))
         
-        analysis = analyze_comprehensive_risk(msg, weather_data=weather_data, use_metta=METTA_AVAILABLE)
+        analysis_key = _analysis_key(msg, weather_data)
+        analysis = _analysis_cache.get(analysis_key)
+        if analysis is None:
+            analysis = analyze_comprehensive_risk(msg, weather_data=weather_data, use_metta=METTA_AVAILABLE)
+            _analysis_cache.set(analysis_key, analysis)
+        else:
+            ctx.logger.info("Using cached analysis for %s", full_flight_id)
         
-        ctx.logger.info(f"Analysis complete: {analysis['recommendation']} (confidence: {analysis['confidence']:.2f})")
+        ctx.logger.info("Analysis complete: %s (confidence: %.2f)", analysis['recommendation'], analysis['confidence'])
         
-        # Create InsuranceOption objects from the analysis
-        insurance_options_objects = []
-        for opt in analysis.get('insurance_options', []):
-            insurance_options_objects.append(
-                InsuranceOption(
-                    option_type=opt['option_type'],
-                    name=opt['name'],
-                    description=opt['description'],
-                    coverage_details=opt['coverage_details'],
-                    premium=opt['premium'],
-                    recommended=opt.get('recommended', False)
-                )
-            )
+        _recommendation_cache.set((msg.airline, msg.flight_number, msg.date), (msg, weather_data, analysis))
         
-        # Create recommendation object
-        recommendation = InsuranceRecommendation(
-            flight_number=f"{msg.airline}{msg.flight_number}",
-            recommended_insurance=analysis['recommendation'],
-            confidence_score=analysis['confidence'],
-            reasoning=analysis['reasoning'],
-            risk_factors=analysis['risk_factors'],
-            estimated_premium=analysis['estimated_premium'],
-            route_info=analysis.get('route'),
-            risk_level=analysis.get('risk_level'),
-            insurance_options=insurance_options_objects
-        )
+        recommendation = build_insurance_recommendation(msg, analysis)
         
         # Check if this was from a chat request
-        chat_sender = ctx.storage.get(f"chat_sender_{full_flight_id}")
+        chat_session = _chat_sessions.get(full_flight_id)
         
-        if chat_sender:
+        if chat_session:
             # Send formatted response via chat
-            airline = ctx.storage.get(f"chat_airline_{full_flight_id}")
-            flight_number = ctx.storage.get(f"chat_flight_{full_flight_id}")
-            date = ctx.storage.get(f"chat_date_{full_flight_id}")
+            chat_senders = chat_session["senders"]
+            airline = chat_session["airline"]
+            flight_number = chat_session["flight_number"]
+            date = chat_session["date"]
             
             response_text = format_recommendation_as_text(analysis, airline, flight_number, date, msg, weather_data)
             
-            ctx.logger.info(f"Sending recommendation to {chat_sender}")
+            ctx.logger.info("Sending recommendation to %s", ', '.join(chat_senders))
             
-            await ctx.send(
-                chat_sender,
-                ChatMessage(
-                    timestamp=datetime.now(),
-                    msg_id=uuid4(),
-                    content=[TextContent(type="text", text=response_text)]
-                )
-            )
+            await _send_text_to_all(ctx, chat_senders, response_text)
             
-            # Clear storage
-            ctx.storage.set(f"chat_sender_{full_flight_id}", None)
-            ctx.storage.set(f"chat_airline_{full_flight_id}", None)
-            ctx.storage.set(f"chat_flight_{full_flight_id}", None)
-            ctx.storage.set(f"chat_date_{full_flight_id}", None)
+            # Clear the session
+            _chat_sessions.discard(full_flight_id)
             
-            ctx.logger.info(f"Sent chat response for {msg.airline}{msg.flight_number}")
+            ctx.logger.info("Sent chat response for %s%s", msg.airline, msg.flight_number)
         else:
             # Handle non-chat request (direct protocol message)
-            ctx.logger.info(f"No chat sender found, checking for pending request")
-            original_sender = ctx.storage.get(f"pending_{full_flight_id}")
+            ctx.logger.info("No chat sender found, checking for pending request")
+            original_sender = _pending_requests.get(full_flight_id)
             if original_sender:
                 await ctx.send(original_sender, recommendation)
-                ctx.storage.set(f"pending_{full_flight_id}", None)
-                ctx.logger.info(f"Sent insurance recommendation to {original_sender}")
+                _pending_requests.discard(full_flight_id)
+                ctx.logger.info("Sent insurance recommendation to %s", original_sender)
             else:
-                ctx.logger.warning(f"No sender found for flight {full_flight_id}")
+                ctx.logger.warning("No sender found for flight %s", full_flight_id)
             
     except Exception as e:
-        ctx.logger.error(f"Error processing historical data: {e}")
-        import traceback
-        ctx.logger.error(f"Traceback: {traceback.format_exc()}")
+        ctx.logger.exception("Error processing historical data: %s", e)
         
         # Try to send error message back to chat sender
         full_flight_id = f"{msg.airline}{msg.flight_number}-{msg.date}"
-        chat_sender = ctx.storage.get(f"chat_sender_{full_flight_id}")
-        if chat_sender:
+        chat_session = _chat_sessions.get(full_flight_id)
+        if chat_session:
             error_text = f"❌ Sorry, I encountered an error analyzing flight {msg.airline}{msg.flight_number}. Please try again."
-            await ctx.send(
-                chat_sender,
-                ChatMessage(
-                    timestamp=datetime.now(),
-                    msg_id=uuid4(),
-                    content=[TextContent(type="text", text=error_text)]
-                )
-            )
-            ctx.storage.set(f"chat_sender_{full_flight_id}", None)
+            await _send_text_to_all(ctx, chat_session["senders"], error_text)
+            _chat_sessions.discard(full_flight_id)
 
 
 # ========================================
@@ -1201,11 +1397,18 @@ async def handle_flight_historical_data(ctx: Context, sender: str, msg: FlightHi
 @insurance_protocol.on_message(model=FlightHistoricalRequest, replies={InsuranceRecommendation})
 async def handle_insurance_request(ctx: Context, sender: str, msg: FlightHistoricalRequest):
     """Handle direct insurance requests via protocol"""
-    ctx.logger.info(f"Insurance request for flight: {msg.airline}{msg.flight_number} on {msg.date}")
+    ctx.logger.info("Insurance request for flight: %s%s on %s", msg.airline, msg.flight_number, msg.date)
     
     try:
+        cached = _recommendation_cache.get((msg.airline, msg.flight_number, msg.date))
+        if cached is not None:
+            flight_data, _, analysis = cached
+            ctx.logger.info("Using cached recommendation for %s%s-%s", msg.airline, msg.flight_number, msg.date)
+            await ctx.send(sender, build_insurance_recommendation(flight_data, analysis))
+            return
+        
         full_flight_id = f"{msg.airline}{msg.flight_number}-{msg.date}"
-        ctx.storage.set(f"pending_{full_flight_id}", sender)
+        _pending_requests.set(full_flight_id, sender)
         
         # Forward to Historical Agent
         await ctx.send(
@@ -1218,7 +1421,7 @@ async def handle_insurance_request(ctx: Context, sender: str, msg: FlightHistori
         )
         
     except Exception as e:
-        ctx.logger.error(f"Error processing insurance request: {e}")
+        ctx.logger.error("Error processing insurance request: %s", e)
         # Send default recommendation on error
         recommendation = InsuranceRecommendation(
             flight_number=f"{msg.airline}{msg.flight_number}",
@@ -1237,8 +1440,8 @@ async def handle_insurance_request(ctx: Context, sender: str, msg: FlightHistori
 async def log_status(ctx: Context):
     """Periodic status logging"""
     ctx.logger.info("TravelSure Insurance Agent is running...")
-    ctx.logger.info(f"Agent Address: {insurance_agent.address}")
-    ctx.logger.info(f"Connected to Flight Historical Agent: {FLIGHT_HISTORICAL_AGENT}")
+    ctx.logger.info("Agent Address: %s", insurance_agent.address)
+    ctx.logger.info("Connected to Flight Historical Agent: %s", FLIGHT_HISTORICAL_AGENT)
 
 
 # Include both protocols
@@ -1,7 +1,15 @@
 # insurance_rag.py
 import re
+from datetime import datetime
 from hyperon import MeTTa, E, S, ValueAtom
 
+
+def _parse_date(date_str: str) -> datetime:
+    """Parse a YYYY-MM-DD date; canonical dates take the C fromisoformat path instead of strptime"""
+    if len(date_str) == 10 and date_str[4] == '-' and date_str[7] == '-':
+        return datetime.fromisoformat(date_str)
+    return datetime.strptime(date_str, '%Y-%m-%d')
+
 class InsuranceRAG:
     """
     RAG (Retrieval-Augmented Generation) system for flight insurance knowledge.
@@ -367,24 +375,25 @@ class InsuranceRAG:
         # 2. Weather impact analysis
         weather_condition = flight_data.get('weather_condition')
         if weather_condition:
-            weather_impact = self.get_weather_impact(weather_condition.lower())
+            condition_key = weather_condition.lower()
+            weather_impact = self.get_weather_impact(condition_key)
             
             # Adjust recommendation based on severe weather
-            if weather_condition.lower() in ['thunderstorms', 'snow', 'fog']:
+            if condition_key in ('thunderstorms', 'snow', 'fog'):
                 risk_adjustments += 0.15
                 risk_factors.append(f"Weather: {weather_condition.title()}")
                 if weather_impact:
                     reasoning_components.append(f"⚠️ {weather_impact[0]}")
                 else:
                     reasoning_components.append(f"⚠️ Severe weather ({weather_condition}) increases delay likelihood")
-            elif weather_condition.lower() == 'rain':
+            elif condition_key == 'rain':
                 risk_adjustments += 0.05
                 risk_factors.append(f"Weather: {weather_condition.title()}")
                 if weather_impact:
                     reasoning_components.append(f"🌧️ {weather_impact[0]}")
                 else:
                     reasoning_components.append(f"🌧️ Rain may cause minor delays")
-            elif weather_condition.lower() in ['clear', 'clouds']:
+            elif condition_key in ('clear', 'clouds'):
                 # Good weather - mention it positively
                 reasoning_components.append(f"☀️ Favorable weather conditions ({weather_condition}) support on-time performance")
         
@@ -412,8 +421,7 @@ class InsuranceRAG:
         season_detected = False
         if date_str:
             try:
-                from datetime import datetime
-                flight_date = datetime.strptime(date_str, '%Y-%m-%d')
+                flight_date = _parse_date(date_str)
                 month = flight_date.month
                 day = flight_date.day
                 
@@ -4,6 +4,18 @@ import re
 from typing import Dict, Tuple, Optional
 from dotenv import load_dotenv
 
+# orjson (de)serializes the API payloads considerably faster than the stdlib json module
+try:
+    import orjson
+    json_loads = orjson.loads
+
+    def json_dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+except ImportError:
+    import json
+    json_loads = json.loads
+    json_dumps = json.dumps
+
 load_dotenv()
 
 class LLM:
@@ -63,7 +75,7 @@ class LLM:
                 "max_tokens": 500
             }
             
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(json_serialize=json_dumps) as session:
                 async with session.post(
                     f"{self.base_url}/chat/completions",
                     json=data,
@@ -71,7 +83,7 @@ class LLM:
                     timeout=aiohttp.ClientTimeout(total=30)
                 ) as response:
                     if response.status == 200:
-                        result = await response.json()
+                        result = await response.json(loads=json_loads)
                         return result["choices"][0]["message"]["content"]
                     else:
                         error_text = await response.text()
@@ -0,0 +1,31 @@
+"""
+Test script to verify the insurance agents define each top-level function only once
+"""
+import ast
+from collections import Counter
+from pathlib import Path
+
+AGENT_DIR = Path(__file__).resolve().parent.parent
+AGENT_FILES = ["app.py", "insurance_agent_chat.py"]
+
+all_unique = True
+
+for filename in AGENT_FILES:
+    tree = ast.parse((AGENT_DIR / filename).read_text(encoding="utf-8"))
+    names = Counter(
+        node.name for node in tree.body
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+    )
+    duplicates = sorted(name for name, count in names.items() if count > 1)
+
+    print(f"{filename}: {sum(names.values())} top-level functions")
+    if duplicates:
+        all_unique = False
+        print(f"  ⚠️ Defined more than once: {', '.join(duplicates)}")
+
+if all_unique:
+    print("\n✅ No duplicate function definitions!")
+else:
+    print("\n⚠️ DUPLICATE DEFINITIONS DETECTED!")
+    print("A later definition silently replaces the earlier one.")
+    raise SystemExit(1)